@@ -1,15 +1,30 @@
 import os
+import sys
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import google.generativeai as genai
 import streamlit as st
-import tempfile
 import re
+import time
 from typing import List, Dict, Tuple
 
+# Shared RAG modules live alongside the RAG service
+RAG_SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "rag_service")
+sys.path.insert(0, RAG_SERVICE_DIR)
+from vector_store import check_namespace, index_state_dir, namespace_counts, open_vector_store, partition_path
+from caches import CachedEmbeddings, CorpusStamp, QueryEmbeddingCache
+from parsing import load_documents
+from manifest import IngestManifest, namespaced_source, source_digest
+from dedup import SignatureIndex, near_duplicate_filter
+from ingestion import ingest_texts
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from context_packing import DEFAULT_CONTEXT_TOKENS, PackedContext, pack_context
+from embedding_backends import DEFAULT_ONNX_DIR, create_embeddings, embedding_model_id
+from embedding_cache import DiskCachedEmbeddings, PersistentEmbeddingCache
+from upserts import DEFAULT_CONCURRENCY, upsert_vectors
+
 # -----------------------------
 # ENV
 # -----------------------------
@@ -18,12 +33,35 @@
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()  # pinecone | numpy | ivf
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(RAG_SERVICE_DIR, "vector_store"))
+INDEX_STATE_DIR = index_state_dir(VECTOR_STORE, PINECONE_INDEX_NAME, VECTOR_STORE_PATH, RAG_SERVICE_DIR)  # Shared per index
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(INDEX_STATE_DIR, "ingest_manifest.json"))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join(INDEX_STATE_DIR, "dedup_index.npz"))
+INGEST_DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.9"))  # Shingle Jaccard; 0 disables
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(INDEX_STATE_DIR, "lexical_index.jsonl"))
+CORPUS_VERSION_PATH = os.path.join(INDEX_STATE_DIR, "corpus_version")  # Tells rag_server's answer cache the index changed
+RAG_NAMESPACE = check_namespace(os.getenv("RAG_NAMESPACE", ""))  # Default namespace for ingestion and search
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(RAG_SERVICE_DIR, "embedding_cache"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))  # Persistent chunk vectors; 0 disables
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", str(DEFAULT_CONCURRENCY)))  # Upsert requests in flight
 
 # RAG Configuration
 TOP_K = 15  # Retrieve more chunks for wider context
 MIN_SIMILARITY = 0.30  # Lower threshold for more results
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")  # BM25 + vector with RRF
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")  # Cross-encoder reranking
+RERANK_MODEL = os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "7"))  # Chunks kept after reranking
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))  # Fall back to retrieval order beyond this
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_CONTEXT_TOKENS)))  # Prompt context cap
 EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 dimension
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx (int8 quantized)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+SHOW_TIMINGS = os.getenv("SHOW_TIMINGS", "false").lower() in ("1", "true", "yes")  # Per-answer stage timings
 DEFAULT_CHUNK_SIZE = 400  # Default chunk size for ingestion
+QUERY_CACHE_SIZE = 512  # Cached query embeddings (reused across Streamlit reruns)
+QUERY_CACHE_TTL = 3600  # Seconds
 
 # -----------------------------
 # HELPER FUNCTIONS
@@ -54,68 +92,81 @@ def compute_text_similarity(text1: str, text2: str) -> float:
 
 
 def deduplicate_chunks(chunks: List[Dict], similarity_threshold: float = 0.85) -> List[Dict]:
-    """Remove near-duplicate chunks using simple text similarity"""
+    """
+    Remove near-duplicate chunks (Jaccard similarity of word sets).
+    Each chunk is tokenized once and only MinHash/LSH candidates are compared,
+    so this stays roughly linear in the number of chunks.
+    """
     if not chunks:
         return []
     
-    unique_chunks = [chunks[0]]
-    for chunk in chunks[1:]:
-        is_duplicate = False
-        for existing in unique_chunks:
-            sim = compute_text_similarity(chunk['text'], existing['text'])
-            if sim > similarity_threshold:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            unique_chunks.append(chunk)
-    return unique_chunks
+    kept = near_duplicate_filter([chunk['text'] for chunk in chunks], similarity_threshold)
+    return [chunks[i] for i in kept]
 
 
-def clean_context(chunks: List[Dict]) -> str:
-    """Clean and format context for the prompt - only text, no metadata"""
-    if not chunks:
-        return ""
-    
-    # Deduplicate
-    unique_chunks = deduplicate_chunks(chunks)
-    
-    # Return only the text content
+def pack_chunks(chunks: List[Dict], max_tokens: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Deduplicate and clean chunk texts, then pack them into max_tokens
+    in relevance order (the last chunk is trimmed at a sentence boundary).
+    """
     formatted_parts = []
-    for chunk in unique_chunks:
+    for chunk in deduplicate_chunks(chunks):
         text = chunk['text'].strip()
         text = re.sub(r'\n\s*\n', '\n', text)
         if text:
             formatted_parts.append(text)
     
-    return "\n\n".join(formatted_parts)
+    return pack_context(formatted_parts, max_tokens)
+
+
+def clean_context(chunks: List[Dict]) -> str:
+    """Clean and format context for the prompt - only text, no metadata"""
+    if not chunks:
+        return ""
+    
+    return "\n\n".join(pack_chunks(chunks).chunks)
 
 # -----------------------------
 # INIT CLIENTS
 # -----------------------------
-@st.cache_resource
-def init_clients():
+def init_index():
+    """Open the configured vector store (Pinecone or a local backend)"""
+    if VECTOR_STORE != "pinecone":
+        return open_vector_store(VECTOR_STORE, VECTOR_STORE_PATH, dimension=EMBEDDING_DIM)
+    
     pc = Pinecone(api_key=PINECONE_API_KEY)
     
     # Check if index exists, if not create it
     try:
-        index = pc.Index(PINECONE_INDEX_NAME)
+        index = pc.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
     except Exception as e:
         st.error(f"❌ Index '{PINECONE_INDEX_NAME}' not found. Creating it now...")
         pc.create_index(
             name=PINECONE_INDEX_NAME,
-            dimension=384,
+            dimension=EMBEDDING_DIM,
             metric="cosine"
         )
         import time
         time.sleep(2)
-        index = pc.Index(PINECONE_INDEX_NAME)
+        index = pc.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
         st.success(f"✅ Index '{PINECONE_INDEX_NAME}' created successfully!")
-    
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
-    )
+    return index
+
+
+@st.cache_resource
+def init_clients():
+    index = init_index()
+    
+    model = create_embeddings(EMBEDDING_BACKEND, ONNX_MODEL_DIR)
+    if EMBEDDING_CACHE_MAX_MB > 0:
+        # Chunk vectors are shared with rag_server and ingest.py through the on-disk cache
+        model = DiskCachedEmbeddings(model, PersistentEmbeddingCache(
+            EMBEDDING_CACHE_PATH,
+            embedding_model_id(EMBEDDING_BACKEND),
+            dimension=EMBEDDING_DIM,
+            max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+        ))
+    embeddings = CachedEmbeddings(model, QueryEmbeddingCache(max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL))
     
     # Gemini init
     genai.configure(api_key=GEMINI_API_KEY)
@@ -123,13 +174,50 @@ def init_clients():
     
     return index, embeddings, model
 
+@st.cache_resource
+def init_manifest():
+    return IngestManifest(INGEST_MANIFEST_PATH)
+
+
+@st.cache_resource
+def init_dedup_index(namespace: str = ""):
+    return SignatureIndex(partition_path(DEDUP_INDEX_PATH, namespace), threshold=INGEST_DEDUP_THRESHOLD or 0.9)
+
+
+@st.cache_resource
+def init_lexical_index(namespace: str = ""):
+    return BM25Index(partition_path(LEXICAL_INDEX_PATH, namespace))
+
+
+@st.cache_resource
+def init_reranker():
+    if not RERANK_ENABLED:
+        return None
+    reranker = CrossEncoderReranker(RERANK_MODEL, budget_ms=RERANK_BUDGET_MS)
+    reranker.load()
+    return reranker
+
 try:
     index, embeddings, model = init_clients()
+    ingest_manifest = init_manifest()
+    dedup_index = init_dedup_index()
+    lexical_index = init_lexical_index()
+    reranker = init_reranker()
 except Exception as e:
     st.error(f"Failed to initialize clients: {str(e)}")
     st.stop()
 
 
+def dedup_index_for(namespace: str) -> SignatureIndex:
+    """Near-duplicate index of a namespace (duplicates are only suppressed within one)"""
+    return dedup_index if not namespace else init_dedup_index(namespace)
+
+
+def lexical_index_for(namespace: str) -> BM25Index:
+    """BM25 index of a namespace"""
+    return lexical_index if not namespace else init_lexical_index(namespace)
+
+
 # -----------------------------
 # RAG RETRIEVAL FUNCTION
 # -----------------------------
@@ -193,13 +281,26 @@ def expand_query_with_context(query: str, conversation_history: List[Dict]) -> s
     return query
 
 
-def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
+def record_timing(stats: Dict, stage: str, start: float):
+    """Store the milliseconds since `start` under stats['timings'][stage] (no-op without stats)"""
+    if stats is not None:
+        stats.setdefault('timings', {})[stage] = (time.perf_counter() - start) * 1000
+
+
+def retrieve_chunks(query: str, top_k: int = None, stats: Dict = None,
+                    namespace: str = RAG_NAMESPACE, metadata_filter: Dict = None) -> List[Dict]:
     """
-    Retrieve relevant chunks from Pinecone.
+    Retrieve relevant chunks from the vector store.
     For summary queries, retrieves ALL chunks.
+    Only `namespace` is searched, restricted to chunks matching the
+    Pinecone-style `metadata_filter` (e.g. {"source": "statement.pdf"}).
+    If `stats` is given, per-stage timings are recorded in it.
     """
     try:
+        lexical_index = lexical_index_for(namespace)
+        start = time.perf_counter()
         query_vec = embeddings.embed_query(query)
+        record_timing(stats, 'embed_query', start)
         
         # For summary queries, fetch more chunks
         if is_summary_query(query):
@@ -207,29 +308,55 @@ def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
         else:
             fetch_count = top_k if top_k else TOP_K
         
+        start = time.perf_counter()
         results = index.query(
             vector=query_vec,
             top_k=fetch_count,
-            include_metadata=True
+            include_metadata=True,
+            namespace=namespace,
+            filter=metadata_filter
         )
+        record_timing(stats, 'vector_query', start)
+        
+        matches = results.get('matches') or []
         
-        if not results.get('matches'):
+        # Hybrid: fuse score-filtered vector matches with BM25 matches (RRF).
+        # BM25 only adds to on-topic queries: without a vector match above
+        # MIN_SIMILARITY the query gets the "not in document" reply
+        fused = HYBRID_SEARCH and not is_summary_query(query)
+        if fused:
+            start = time.perf_counter()
+            dense = [
+                m for m in matches
+                if m.get('score', 0) >= MIN_SIMILARITY and (m.get('metadata') or {}).get('text')
+            ]
+            lexical = lexical_index.search(query, fetch_count, filter=metadata_filter) if dense else []
+            matches = reciprocal_rank_fusion([dense, lexical], top_k=fetch_count)
+            record_timing(stats, 'lexical_search', start)
+        
+        if not matches:
             return []
         
         # Extract chunks
         filtered_chunks = []
-        for match in results['matches']:
+        for match in matches:
             score = match.get('score', 0)
-            metadata = match.get('metadata', {})
+            metadata = match.get('metadata') or {}
             text = metadata.get('text', '')
             
-            # For summary, include all; otherwise filter by score
-            if is_summary_query(query) or (score >= MIN_SIMILARITY and text):
+            # For summary, include all; fused scores are RRF ranks (vector hits were gated above)
+            if is_summary_query(query) or (text and (fused or score >= MIN_SIMILARITY)):
                 filtered_chunks.append({'text': text, 'score': score})
         
         # Sort by score descending
         filtered_chunks.sort(key=lambda x: x['score'], reverse=True)
         
+        # Rerank candidates with the cross-encoder (keeps retrieval order if over budget)
+        if reranker is not None and not is_summary_query(query):
+            start = time.perf_counter()
+            filtered_chunks = reranker.rerank(query, filtered_chunks, RERANK_TOP_N, text_of=lambda c: c['text'])
+            record_timing(stats, 'rerank', start)
+        
         return filtered_chunks
         
     except Exception as e:
@@ -239,17 +366,30 @@ def retrieve_chunks(query: str, top_k: int = None) -> List[Dict]:
 # -----------------------------
 # BUILD FINAL ANSWER (Gemini)
 # -----------------------------
-def generate_answer(query: str, chunks: List[Dict], conversation_history: List[Dict] = None) -> str:
-    """Generate answer using Gemini with strict RAG prompt and conversation history"""
-    
+NO_DOCUMENT_ANSWER = "The provided document does not contain this information. Please upload a relevant document first."
+NO_CONTEXT_ANSWER = "The provided document does not contain this information."
+
+
+def build_prompt(query: str, chunks: List[Dict], conversation_history: List[Dict] = None,
+                 stats: Dict = None) -> Tuple[str, str]:
+    """
+    Build the strict RAG prompt with conversation history.
+    Returns (prompt, "") or ("", fallback answer) when there is no usable context.
+    If `stats` is given, the packed context size is recorded in it.
+    """
     if not chunks:
-        return "The provided document does not contain this information. Please upload a relevant document first."
+        return "", NO_DOCUMENT_ANSWER
     
-    # Clean and format context - only text
-    context = clean_context(chunks)
+    # Clean, deduplicate and pack the context into the token budget - only text
+    start = time.perf_counter()
+    packed = pack_chunks(chunks)
+    record_timing(stats, 'pack_context', start)
+    context = "\n\n".join(packed.chunks)
+    if stats is not None:
+        stats.update(context_chunks=len(packed.chunks), context_tokens=packed.tokens, context_trimmed=packed.trimmed)
     
     if not context.strip():
-        return "The provided document does not contain this information."
+        return "", NO_CONTEXT_ANSWER
     
     # Build conversation history string
     history_str = ""
@@ -285,6 +425,16 @@ def generate_answer(query: str, chunks: List[Dict], conversation_history: List[D
     prompt += f"""\nCURRENT QUESTION: {query}
 
 ANSWER:"""
+    
+    return prompt, ""
+
+
+def generate_answer(query: str, chunks: List[Dict], conversation_history: List[Dict] = None,
+                    stats: Dict = None) -> str:
+    """Generate answer using Gemini with strict RAG prompt and conversation history"""
+    prompt, fallback = build_prompt(query, chunks, conversation_history, stats)
+    if not prompt:
+        return fallback
 
     try:
         response = model.generate_content(prompt)
@@ -293,31 +443,58 @@ def generate_answer(query: str, chunks: List[Dict], conversation_history: List[D
         return f"Error generating response: {str(e)}"
 
 
+def stream_answer(query: str, chunks: List[Dict], conversation_history: List[Dict] = None,
+                  stats: Dict = None):
+    """Streaming variant of generate_answer: yields answer text as Gemini produces it"""
+    prompt, fallback = build_prompt(query, chunks, conversation_history, stats)
+    if not prompt:
+        yield fallback
+        return
+    
+    try:
+        start = time.perf_counter()
+        first = True
+        for chunk in model.generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # Empty or blocked chunk
+            if text:
+                if first:
+                    record_timing(stats, 'first_token', start)
+                    first = False
+                yield text
+        record_timing(stats, 'generate', start)
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+
 # -----------------------------
 # DOCUMENT INGESTION FUNCTION
 # -----------------------------
-def ingest_document(uploaded_file, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[bool, int]:
-    """Ingest PDF or DOCX file into Pinecone"""
+def ingest_document(uploaded_file, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    namespace: str = RAG_NAMESPACE) -> Tuple[bool, int]:
+    """Ingest PDF or DOCX file into a namespace of the vector store"""
     try:
         filename = uploaded_file.name
+        source = namespaced_source(filename, namespace)
         file_ext = filename.lower().split('.')[-1]
         
-        # Save uploaded file to temp location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_ext}") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            tmp_path = tmp_file.name
+        if file_ext not in ['pdf', 'docx', 'doc']:
+            st.error("Unsupported file type")
+            return False, 0
+        
+        # Skip files already ingested with identical content and chunking
+        digest = source_digest(uploaded_file.getbuffer())
+        params = {"chunk_size": chunk_size, "chunk_overlap": int(chunk_size * 0.2)}
+        if ingest_manifest.is_unchanged(source, digest, params):
+            chunk_count = len(ingest_manifest.chunk_ids(source))
+            st.info(f"⏭️ '{filename}' is unchanged ({chunk_count} chunks already ingested)")
+            return True, chunk_count
         
-        # Load document based on type
+        # Load document straight from the in-memory upload (no temp file)
         with st.spinner("Loading document..."):
-            if file_ext == 'pdf':
-                loader = PyPDFLoader(tmp_path)
-            elif file_ext in ['docx', 'doc']:
-                loader = Docx2txtLoader(tmp_path)
-            else:
-                st.error("Unsupported file type")
-                return False, 0
-            
-            docs = loader.load()
+            docs = load_documents(uploaded_file, filename)
         
         # Split into chunks with configurable size
         chunk_overlap = int(chunk_size * 0.2)  # 20% overlap
@@ -330,47 +507,49 @@ def ingest_document(uploaded_file, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tupl
             )
             chunks = splitter.split_documents(docs)
         
-        # Prepare texts for batch embedding
-        texts_to_embed = []
-        valid_chunks_data = []
-        
-        for idx, doc in enumerate(chunks):
-            text = sanitize_text(doc.page_content)
-            if text:
-                texts_to_embed.append(text)
-                valid_chunks_data.append({'idx': idx, 'text': text})
+        texts = [text for text in (sanitize_text(doc.page_content) for doc in chunks) if text]
         
-        if not valid_chunks_data:
+        if not texts:
             st.warning("No valid text found in document")
-            os.unlink(tmp_path)
             return False, 0
         
-        # Batch embed using embed_documents
-        with st.spinner("Generating embeddings..."):
-            all_embeddings = embeddings.embed_documents(texts_to_embed)
-        
-        # Prepare vectors (only store text in metadata)
-        vectors_to_upsert = []
-        for i, chunk_data in enumerate(valid_chunks_data):
-            vector_id = f"{filename}-chunk-{chunk_data['idx']}"
-            vectors_to_upsert.append({
-                "id": vector_id,
-                "values": all_embeddings[i],
-                "metadata": {"text": chunk_data['text']}
-            })
-        
-        # Upsert in batches
-        with st.spinner("Uploading to database..."):
-            batch_size = 100
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                index.upsert(vectors=batch)
+        def upsert_records(records):
+            # Batch embed using embed_documents
+            with st.spinner(f"Generating embeddings for {len(records)} new chunks..."):
+                vectors = embeddings.embed_documents([record["text"] for record in records])
+            
+            # Upsert concurrently (size-aware batches, retried with backoff)
+            with st.spinner("Uploading to database..."):
+                result = upsert_vectors(
+                    lambda batch: index.upsert(vectors=batch, namespace=namespace),
+                    [
+                        {"id": record["id"], "values": values, "metadata": record["metadata"]}
+                        for record, values in zip(records, vectors)
+                    ],
+                    concurrency=UPSERT_CONCURRENCY
+                )
+            return result.upserted, result.failed_ids
         
-        # Cleanup
-        os.unlink(tmp_path)
+        # Content-hash ids: only chunks not ingested before are embedded,
+        # chunks the document no longer contains are deleted
+        result = ingest_texts(
+            texts, filename, digest, params,
+            index=index,
+            manifest=ingest_manifest,
+            lexical_index=lexical_index_for(namespace),
+            upsert_records=upsert_records,
+            dedup_index=dedup_index_for(namespace) if INGEST_DEDUP_THRESHOLD > 0 else None,
+            namespace=namespace,
+            on_change=CorpusStamp(CORPUS_VERSION_PATH).bump
+        )
         
-        st.success(f"✅ Ingested {len(vectors_to_upsert)} chunks from '{filename}'")
-        return True, len(vectors_to_upsert)
+        if result.failed_ids:
+            st.warning(f"⚠️ {len(result.failed_ids)} chunks failed to upload; upload '{filename}' again to retry them")
+        st.success(
+            f"✅ Ingested {result.upserted} new chunks from '{filename}' "
+            f"({result.unchanged} unchanged, {result.duplicates} near-duplicates dropped, {result.deleted} removed)"
+        )
+        return True, len(result.chunk_ids)
         
     except Exception as e:
         st.error(f"Error: {str(e)}")
@@ -378,9 +557,16 @@ def ingest_document(uploaded_file, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tupl
 
 
 def wipe_index():
-    """Delete all vectors from the Pinecone index"""
+    """Delete all vectors (in every namespace) from the vector store"""
     try:
-        index.delete(delete_all=True)
+        namespaces = set(namespace_counts(index.describe_index_stats())) | {""}
+        for namespace in namespaces:
+            index.delete(delete_all=True, namespace=namespace)
+            for partition in (dedup_index_for(namespace), lexical_index_for(namespace)):
+                partition.clear()
+                partition.save()
+        ingest_manifest.clear()
+        CorpusStamp(CORPUS_VERSION_PATH).bump()
         return True
     except Exception as e:
         st.error(f"❌ Error wiping index: {str(e)}")
@@ -420,9 +606,25 @@ def wipe_index():
         help="Smaller chunks = more precise retrieval. Larger chunks = more context per chunk."
     )
     
+    # Namespace (partition) used for uploads and search, plus an optional source filter
+    namespace = st.text_input(
+        "Namespace",
+        value=RAG_NAMESPACE,
+        help="Documents are uploaded to and searched in this namespace only (empty = default)"
+    ).strip()
+    try:
+        namespace = check_namespace(namespace)
+    except ValueError as e:
+        st.error(str(e))
+        namespace = RAG_NAMESPACE
+    source_filter = st.text_input("Only search document", help="File name to restrict answers to (optional)").strip()
+    metadata_filter = {"source": source_filter} if source_filter else None
+    
+    show_timings = st.checkbox("⏱️ Show timings", value=SHOW_TIMINGS, help="Per-stage latency under each answer")
+    
     if uploaded_file is not None:
         if st.button("📤 Upload Document", use_container_width=True, type="primary"):
-            success, chunk_count = ingest_document(uploaded_file, chunk_size=chunk_size)
+            success, chunk_count = ingest_document(uploaded_file, chunk_size=chunk_size, namespace=namespace)
             if success:
                 if "ingested_docs" not in st.session_state:
                     st.session_state.ingested_docs = []
@@ -473,7 +675,7 @@ def wipe_index():
     
     # Get AI response
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
+        with st.spinner("Searching documents..."):
             # Get conversation history (excluding current message)
             history = st.session_state.messages[:-1]
             
@@ -481,11 +683,20 @@ def wipe_index():
             expanded_query = expand_query_with_context(query, history)
             
             # Retrieve chunks using the expanded query
-            chunks = retrieve_chunks(expanded_query)
-            
-            # Pass conversation history for context awareness in generation
-            answer = generate_answer(query, chunks, conversation_history=history)
-            st.markdown(answer)
+            answer_stats = {}
+            chunks = retrieve_chunks(
+                expanded_query, stats=answer_stats, namespace=namespace, metadata_filter=metadata_filter
+            )
+        
+        # Stream the answer token by token, with conversation history for context awareness
+        answer = st.write_stream(stream_answer(query, chunks, conversation_history=history, stats=answer_stats)).strip()
+        if answer_stats.get("context_tokens"):
+            st.caption(
+                f"Context: {answer_stats['context_chunks']} chunks, ~{answer_stats['context_tokens']} tokens"
+                + (" (trimmed to budget)" if answer_stats['context_trimmed'] else "")
+            )
+        if show_timings and answer_stats.get("timings"):
+            st.caption("⏱️ " + " · ".join(f"{stage} {ms:.0f} ms" for stage, ms in answer_stats["timings"].items()))
     
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -5,7 +5,6 @@
 from pinecone import Pinecone
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from tqdm import tqdm
 
 # --------------------------------
@@ -14,36 +13,85 @@
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
+# Shared RAG modules live alongside the RAG service
+RAG_SERVICE_DIR = os.path.join(BASE_DIR, "..", "backend", "rag_service")
+sys.path.insert(0, RAG_SERVICE_DIR)
+from vector_store import check_namespace, index_state_dir, open_vector_store, partition_path
+from manifest import IngestManifest, namespaced_source, source_digest
+from dedup import SignatureIndex
+from lexical_index import BM25Index
+from caches import CorpusStamp
+from ingestion import ingest_texts
+from embedding_backends import DEFAULT_ONNX_DIR, create_embeddings, embedding_model_id
+from embedding_cache import DiskCachedEmbeddings, PersistentEmbeddingCache
+from upserts import DEFAULT_CONCURRENCY, upsert_vectors
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 PDF_PATH = os.getenv("PDF_PATH") or os.path.join(BASE_DIR, "final_resume.pdf")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()  # pinecone | numpy | ivf
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(RAG_SERVICE_DIR, "vector_store"))
+INDEX_STATE_DIR = index_state_dir(VECTOR_STORE, PINECONE_INDEX_NAME, VECTOR_STORE_PATH, RAG_SERVICE_DIR)  # Shared per index
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(INDEX_STATE_DIR, "ingest_manifest.json"))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join(INDEX_STATE_DIR, "dedup_index.npz"))
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(INDEX_STATE_DIR, "lexical_index.jsonl"))
+CORPUS_VERSION_PATH = os.path.join(INDEX_STATE_DIR, "corpus_version")  # Tells rag_server's answer cache the index changed
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(RAG_SERVICE_DIR, "embedding_cache"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))  # Persistent chunk vectors; 0 disables
+INGEST_DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.9"))  # Shingle Jaccard; 0 disables
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx (int8 quantized)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+RAG_NAMESPACE = check_namespace(os.getenv("RAG_NAMESPACE", ""))  # Namespace to ingest into
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", str(DEFAULT_CONCURRENCY)))  # Upsert requests in flight
 
 EMBEDDING_DIM = 384   # all-MiniLM-L6-v2 output dim
+CHUNK_PARAMS = {"chunk_size": 400, "chunk_overlap": 80}
 
-if not PINECONE_API_KEY or not PINECONE_INDEX_NAME:
+if VECTOR_STORE == "pinecone" and (not PINECONE_API_KEY or not PINECONE_INDEX_NAME):
     raise ValueError("❌ Missing PINECONE_API_KEY or PINECONE_INDEX_NAME in .env")
 
 if not os.path.exists(PDF_PATH):
     raise FileNotFoundError(f"❌ PDF not found: {PDF_PATH}")
 
-# Optional CLI override: python ingest.py <pdf_path>
+# Optional CLI overrides: python ingest.py <pdf_path> [namespace]
 if len(sys.argv) > 1:
     PDF_PATH = sys.argv[1]
+if len(sys.argv) > 2:
+    RAG_NAMESPACE = check_namespace(sys.argv[2])
 
 
 # --------------------------------
-# INIT PINECONE CLIENT
+# INIT VECTOR STORE
 # --------------------------------
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+if VECTOR_STORE == "pinecone":
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
+else:
+    index = open_vector_store(VECTOR_STORE, VECTOR_STORE_PATH, dimension=EMBEDDING_DIM)
 
 
 # --------------------------------
 # ENSURE INDEX EXISTS
 # --------------------------------
 def ensure_index():
-    print(f"✅ Using Pinecone index: {PINECONE_INDEX_NAME}")
+    if VECTOR_STORE == "pinecone":
+        print(f"✅ Using Pinecone index: {PINECONE_INDEX_NAME}")
+    else:
+        print(f"✅ Using local '{VECTOR_STORE}' vector store: {VECTOR_STORE_PATH}")
+
+
+# --------------------------------
+# SKIP UNCHANGED FILES
+# --------------------------------
+pdf_filename = os.path.basename(PDF_PATH)
+manifest_source = namespaced_source(pdf_filename, RAG_NAMESPACE)
+manifest = IngestManifest(INGEST_MANIFEST_PATH)
+pdf_digest = source_digest(PDF_PATH)
+
+if manifest.is_unchanged(manifest_source, pdf_digest, CHUNK_PARAMS):
+    print(f"⏭️ '{pdf_filename}' is unchanged since the last ingestion, nothing to do")
+    sys.exit(0)
 
 
 # --------------------------------
@@ -73,8 +121,8 @@ def sanitize_text(text: str) -> str:
 # --------------------------------
 print("✂️ Splitting text into chunks...")
 splitter = RecursiveCharacterTextSplitter(
-    chunk_size=400,
-    chunk_overlap=80,
+    chunk_size=CHUNK_PARAMS["chunk_size"],
+    chunk_overlap=CHUNK_PARAMS["chunk_overlap"],
     separators=["\n\n", "\n", ".", " "],
     length_function=len
 )
@@ -85,13 +133,17 @@ def sanitize_text(text: str) -> str:
 # --------------------------------
 # LOAD EMBEDDING MODEL
 # --------------------------------
-print("🧠 Loading embedding model (MiniLM)...")
+print(f"🧠 Loading embedding model (MiniLM, {EMBEDDING_BACKEND})...")
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={'device': 'cpu'},
-    encode_kwargs={'normalize_embeddings': True}
-)
+embeddings = create_embeddings(EMBEDDING_BACKEND, ONNX_MODEL_DIR)
+if EMBEDDING_CACHE_MAX_MB > 0:
+    # Reuse chunk vectors computed by earlier runs, rag_server or the Streamlit app
+    embeddings = DiskCachedEmbeddings(embeddings, PersistentEmbeddingCache(
+        EMBEDDING_CACHE_PATH,
+        embedding_model_id(EMBEDDING_BACKEND),
+        dimension=EMBEDDING_DIM,
+        max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+    ))
 
 
 # --------------------------------
@@ -101,45 +153,69 @@ def sanitize_text(text: str) -> str:
 
 print(f"🚀 Uploading {len(chunks)} chunks to Pinecone...\n")
 
-# Get source filename
-pdf_filename = os.path.basename(PDF_PATH)
-
 # Prepare texts for batch embedding (use embed_documents for efficiency)
-texts_to_embed = []
-valid_chunks = []
-
-for idx, doc in enumerate(chunks):
+texts = []
+for doc in chunks:
     text = sanitize_text(doc.page_content)
     if text:  # Skip empty chunks
-        texts_to_embed.append(text)
-        valid_chunks.append((idx, doc, text))
-
-print(f"📊 Processing {len(valid_chunks)} valid chunks (skipped {len(chunks) - len(valid_chunks)} empty)")
+        texts.append(text)
 
-# Batch embed all documents at once (more efficient than embed_query one by one)
-print("🧠 Generating embeddings...")
-all_embeddings = embeddings.embed_documents(texts_to_embed)
-print(f"✅ Generated {len(all_embeddings)} embeddings (dim={len(all_embeddings[0])})")
+print(f"📊 Processing {len(texts)} valid chunks (skipped {len(chunks) - len(texts)} empty)")
 
-# Prepare vectors - only store text in metadata (simplified)
-vectors_to_upsert = []
-for i, (chunk_idx, doc, text) in enumerate(tqdm(valid_chunks, desc="Preparing vectors")):
-    vector_id = f"{pdf_filename}-chunk-{chunk_idx}"
+def upsert_records(records):
+    # Batch embed all new chunks at once (more efficient than embed_query one by one)
+    print("🧠 Generating embeddings...")
+    all_embeddings = embeddings.embed_documents([record["text"] for record in records])
+    print(f"✅ Generated {len(all_embeddings)} embeddings")
+    if isinstance(embeddings, DiskCachedEmbeddings):
+        print(f"♻️ Reused {embeddings.hits} cached embeddings, computed {embeddings.misses}")
+    
+    # Prepare vectors - text plus the source document (for metadata filters)
+    vectors_to_upsert = []
+    for record, values in zip(tqdm(records, desc="Preparing vectors"), all_embeddings):
+        vectors_to_upsert.append({
+            "id": record["id"],
+            "values": values,
+            "metadata": record["metadata"]
+        })
+    
+    # Upsert concurrently: batches sized by bytes, transient failures retried with backoff
+    print(f"\n💾 Uploading to Pinecone (namespace '{RAG_NAMESPACE}')...")
+    progress = tqdm(total=len(vectors_to_upsert), desc="Uploading")
     
-    vectors_to_upsert.append({
-        "id": vector_id,
-        "values": all_embeddings[i],
-        "metadata": {"text": text}
-    })
-
-# Upsert in batches
-batch_size = 100
-print(f"\n💾 Uploading to Pinecone...")
-for i in tqdm(range(0, len(vectors_to_upsert), batch_size), desc="Uploading"):
-    batch = vectors_to_upsert[i:i + batch_size]
-    try:
-        index.upsert(vectors=batch)
-    except Exception as e:
-        print(f"⚠️ Error: {e}")
-
-print(f"\n✅ Done! Ingested {len(vectors_to_upsert)} chunks from '{pdf_filename}'")
+    def upsert_batch(vectors):
+        index.upsert(vectors=vectors, namespace=RAG_NAMESPACE)
+        progress.update(len(vectors))
+    
+    result = upsert_vectors(upsert_batch, vectors_to_upsert, concurrency=UPSERT_CONCURRENCY)
+    progress.close()
+    return result.upserted, result.failed_ids
+
+
+# Content-hash ids: only chunks not ingested before are embedded, chunks the
+# document no longer contains are deleted (unless an upload failed), and
+# rag_server's answer cache is told the index changed
+result = ingest_texts(
+    texts, pdf_filename, pdf_digest, CHUNK_PARAMS,
+    index=index,
+    manifest=manifest,
+    lexical_index=BM25Index(partition_path(LEXICAL_INDEX_PATH, RAG_NAMESPACE)),
+    upsert_records=upsert_records,
+    dedup_index=(
+        SignatureIndex(partition_path(DEDUP_INDEX_PATH, RAG_NAMESPACE), threshold=INGEST_DEDUP_THRESHOLD)
+        if INGEST_DEDUP_THRESHOLD > 0 else None
+    ),
+    namespace=RAG_NAMESPACE,
+    on_change=CorpusStamp(CORPUS_VERSION_PATH).bump
+)
+
+print(f"🔁 {result.upserted} new, {result.unchanged} unchanged, {result.duplicates} near-duplicates dropped, "
+      f"{result.deleted} removed")
+if result.failed_ids:
+    print(f"⚠️ {len(result.failed_ids)} chunks failed after retries; the next run retries them")
+    for vector_id in result.failed_ids:
+        print(f"   - {vector_id}")
+
+print(f"\n✅ Done! Ingested {result.upserted} new chunks from '{pdf_filename}'")
+if result.failed_ids:
+    sys.exit(1)
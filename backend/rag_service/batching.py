@@ -0,0 +1,107 @@
+"""
+Dynamic micro-batching of query embeddings
+Concurrent /chat requests each need one query embedding. Instead of running
+many batch-of-one forward passes, callers queue their text and a dispatcher
+thread embeds whatever has arrived (up to `max_batch_size`, waiting at most
+`max_wait_ms` after the first request) in one embed_documents call.
+"""
+
+import os
+import time
+import queue
+import threading
+from typing import Dict, List, Optional
+
+
+class _PendingQuery:
+    __slots__ = ("text", "done", "vector", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class MicroBatchingEmbeddings:
+    """
+    Drop-in wrapper around a LangChain embeddings object.
+    embed_query blocks until its batch is embedded and returns that
+    caller's vector; everything else is delegated unchanged. The dispatcher
+    thread starts on first use (and again in a forked child process).
+    """
+
+    def __init__(self, embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        self._queue: "queue.Queue[_PendingQuery]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def _ensure_dispatcher(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._dispatch, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[_PendingQuery]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self):
+        while True:
+            batch = self._collect()
+            try:
+                vectors = self.embeddings.embed_documents([pending.text for pending in batch])
+                for pending, vector in zip(batch, vectors):
+                    pending.vector = vector
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                self.batches += 1
+                self.queries += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                for pending in batch:
+                    pending.done.set()
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_dispatcher()
+        pending = _PendingQuery(text)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.queries,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,86 @@
+"""
+Benchmark: near-duplicate chunk removal
+Compares the old all-pairs Jaccard deduplication with the MinHash/LSH
+version in dedup.py on synthetic corpora of 100-1000 chunks.
+
+Usage: python benchmarks/dedup_benchmark.py [--sizes 100 250 500 1000] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dedup import near_duplicate_filter
+
+VOCABULARY = (
+    "budget savings income expense loan emi interest rate tax deduction 80c elss ppf "
+    "mutual fund sip equity debt credit card score insurance premium term health "
+    "student rent groceries emergency fund inflation return risk portfolio account "
+    "bank upi transfer salary stipend scholarship goal month year plan track spend"
+).split()
+
+
+def legacy_deduplicate(texts, threshold=0.85):
+    """The original O(n^2) implementation from apis/app.py, kept for comparison"""
+    def similarity(text1, text2):
+        words1 = set(text1.lower().split())
+        words2 = set(text2.lower().split())
+        if not words1 or not words2:
+            return 0.0
+        return len(words1 & words2) / len(words1 | words2)
+
+    if not texts:
+        return []
+    kept = [0]
+    for i in range(1, len(texts)):
+        if not any(similarity(texts[i], texts[j]) > threshold for j in kept):
+            kept.append(i)
+    return kept
+
+
+def synthetic_chunks(n, duplicate_rate=0.2, seed=0):
+    """~80-word chunks; a share of them are lightly edited copies of earlier ones"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        if texts and rng.random() < duplicate_rate:
+            words = rng.choice(texts).split()
+            words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+            texts.append(" ".join(words))
+        else:
+            texts.append(" ".join(f"{rng.choice(VOCABULARY)}{rng.randrange(40)}" for _ in range(80)))
+    return texts
+
+
+def best_time(fn, texts, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>7} {'legacy ms':>10} {'lsh ms':>8} {'speedup':>8} {'lsh us/chunk':>13} {'kept (legacy/lsh)':>18}")
+    for n in args.sizes:
+        texts = synthetic_chunks(n)
+        legacy_s, legacy_kept = best_time(legacy_deduplicate, texts, args.repeat)
+        lsh_s, lsh_kept = best_time(near_duplicate_filter, texts, args.repeat)
+        print(
+            f"{n:>7} {legacy_s * 1000:>10.1f} {lsh_s * 1000:>8.1f} {legacy_s / lsh_s:>7.1f}x "
+            f"{lsh_s / n * 1e6:>13.1f} {len(legacy_kept):>8}/{len(lsh_kept):<9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
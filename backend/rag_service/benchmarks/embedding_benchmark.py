@@ -0,0 +1,99 @@
+"""
+Benchmark: torch vs int8 ONNX embedding backends
+Checks that the ONNX export agrees with the torch model (cosine similarity
+of the two embeddings of the same text) and compares single-query latency
+and batched ingestion throughput.
+
+Usage: python benchmarks/embedding_benchmark.py [--chunks 512] [--queries 200] [--batch-size 64]
+       (export the ONNX model first: python embedding_backends.py export)
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from embedding_backends import DEFAULT_ONNX_DIR, create_embeddings
+
+SENTENCES = [
+    "Set aside {n}% of your monthly stipend for an emergency fund.",
+    "Section 80C allows deductions of up to Rs {n},000 for ELSS, PPF and insurance premiums.",
+    "Paying the full credit card balance every month avoids {n}% interest charges.",
+    "A SIP of Rs {n}00 per month in an index fund builds wealth over time.",
+    "Track groceries, rent and transport separately to see where the money goes.",
+    "Education loan interest is deductible under Section 80E for up to {n} years.",
+    "Keep your credit utilization below {n}% to protect your credit score.",
+    "Term insurance is cheaper than endowment plans for the same cover.",
+]
+
+
+def synthetic_texts(n, sentences_per_text=4, seed=0):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(SENTENCES).format(n=rng.randrange(1, 60)) for _ in range(sentences_per_text))
+        for _ in range(n)
+    ]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def query_latencies(embeddings, queries):
+    embeddings.embed_query(queries[0])  # Warm up
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def ingest_throughput(embeddings, texts, batch_size):
+    embeddings.embed_documents(texts[:batch_size])  # Warm up
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[i:i + batch_size]))
+    return len(texts) / (time.perf_counter() - start), np.array(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--onnx-dir", default=DEFAULT_ONNX_DIR)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.chunks)
+    queries = synthetic_texts(args.queries, sentences_per_text=1, seed=1)
+
+    results = {}
+    for backend in ("torch", "onnx"):
+        embeddings = create_embeddings(backend, args.onnx_dir)
+        latencies = query_latencies(embeddings, queries)
+        chunks_per_sec, vectors = ingest_throughput(embeddings, texts, args.batch_size)
+        results[backend] = (latencies, chunks_per_sec, vectors)
+
+    torch_vectors, onnx_vectors = results["torch"][2], results["onnx"][2]
+    assert onnx_vectors.shape == torch_vectors.shape, "dimension mismatch"
+    cosine = np.sum(torch_vectors * onnx_vectors, axis=1)
+    norms = np.linalg.norm(onnx_vectors, axis=1)
+    print(f"Parity over {len(texts)} chunks: mean cosine {cosine.mean():.4f}, min {cosine.min():.4f}, "
+          f"ONNX norms {norms.min():.4f}-{norms.max():.4f}, dim {onnx_vectors.shape[1]}")
+
+    print(f"\n{'backend':>8} {'query p50 ms':>13} {'query p95 ms':>13} {'query p99 ms':>13} {'ingest chunks/s':>16}")
+    for backend, (latencies, chunks_per_sec, _) in results.items():
+        print(
+            f"{backend:>8} {percentile_ms(latencies, 50):>13.2f} {percentile_ms(latencies, 95):>13.2f} "
+            f"{percentile_ms(latencies, 99):>13.2f} {chunks_per_sec:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
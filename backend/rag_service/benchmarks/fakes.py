@@ -0,0 +1,171 @@
+"""
+In-process stand-ins for Pinecone, Gemini and the embedding model
+Used by the offline benchmarks and the load-test harness so the RAG code
+paths can be timed without API keys. Every fake can add a fixed latency
+per call to imitate the network round trip of the real service.
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vector_store import matches_filter
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _sleep_ms(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+class FakeEmbeddings:
+    """
+    Deterministic bag-of-hashed-words vectors (normalized, `dimension`-d).
+    Texts sharing words get similar vectors, so retrieval returns related
+    chunks. `ms_per_batch` / `ms_per_text` imitate model compute time.
+    """
+
+    def __init__(self, dimension: int = 384, ms_per_batch: float = 0.0, ms_per_text: float = 0.0):
+        self.dimension = dimension
+        self.ms_per_batch = ms_per_batch
+        self.ms_per_text = ms_per_text
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            vector[zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        _sleep_ms(self.ms_per_batch + self.ms_per_text * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakePineconeIndex:
+    """
+    Exact cosine search over in-memory dicts, with Pinecone's call
+    signatures (namespaces and metadata filters included)
+    """
+
+    def __init__(self, dimension: int = 384, latency_ms: float = 0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.upsert_calls = 0
+        self._namespaces: Dict[str, Dict[str, tuple]] = {}
+        self._snapshots: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict], namespace: str = "", **kwargs):
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            self.upsert_calls += 1
+            stored = self._namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                stored[vector["id"]] = (vector["values"], vector.get("metadata") or {})
+            self._snapshots.pop(namespace, None)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, namespace: str = "", **kwargs):
+        _sleep_ms(self.latency_ms)
+        with self._lock:
+            stored = self._namespaces.get(namespace, {})
+            if delete_all:
+                stored.clear()
+            for vector_id in ids or []:
+                stored.pop(vector_id, None)
+            self._snapshots.pop(namespace, None)
+        return {}
+
+    def _snapshot(self, namespace: str):
+        with self._lock:
+            snapshot = self._snapshots.get(namespace)
+            if snapshot is None:
+                stored = self._namespaces.get(namespace, {})
+                ids = list(stored)
+                matrix = (
+                    np.array([stored[i][0] for i in ids], dtype=np.float32)
+                    if ids else np.zeros((0, self.dimension), dtype=np.float32)
+                )
+                snapshot = self._snapshots[namespace] = (ids, matrix, [stored[i][1] for i in ids])
+            return snapshot
+
+    def query(self, vector: List[float], top_k: int = 10, include_metadata: bool = False,
+              namespace: str = "", filter: Optional[Dict] = None, **kwargs) -> Dict:
+        _sleep_ms(self.latency_ms)
+        ids, matrix, metadata = self._snapshot(namespace)
+        if not ids:
+            return {"matches": []}
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        if filter:
+            scores = np.where([matches_filter(m, filter) for m in metadata], scores, -np.inf)
+        top = [i for i in np.argsort(-scores)[:top_k] if scores[i] > -np.inf]
+        return {"matches": [
+            {
+                "id": ids[i],
+                "score": float(scores[i]),
+                **({"metadata": metadata[i]} if include_metadata else {})
+            }
+            for i in top
+        ]}
+
+    def describe_index_stats(self, **kwargs) -> Dict:
+        with self._lock:
+            counts = {namespace: len(stored) for namespace, stored in self._namespaces.items() if stored}
+        return {
+            "total_vector_count": sum(counts.values()),
+            "dimension": self.dimension,
+            "namespaces": {namespace: {"vector_count": count} for namespace, count in counts.items()},
+        }
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    generate_content() stand-in: answers after `latency_ms` (time to first
+    token); with stream=True yields `stream_chunks` pieces `ms_per_chunk` apart.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, ms_per_chunk: float = 0.0, stream_chunks: int = 8, answer_words: int = 120):
+        self.latency_ms = latency_ms
+        self.ms_per_chunk = ms_per_chunk
+        self.stream_chunks = stream_chunks
+        self.answer_words = answer_words
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        words = _WORD.findall(prompt.lower()) or ["answer"]
+        return " ".join(words[i % len(words)] for i in range(self.answer_words))
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        self.calls += 1
+        _sleep_ms(self.latency_ms)
+        answer = self._answer(prompt)
+        if not stream:
+            return FakeResponse(answer)
+        return self._stream(answer)
+
+    def _stream(self, answer: str):
+        words = answer.split(" ")
+        size = max(1, -(-len(words) // self.stream_chunks))
+        for i in range(0, len(words), size):
+            if i:
+                _sleep_ms(self.ms_per_chunk)
+            yield FakeResponse(" ".join(words[i:i + size]) + " ")
@@ -0,0 +1,322 @@
+"""
+Concurrency load test for the RAG service's /chat and /upload-documents
+Drives a rag_server instance at increasing concurrency levels and reports,
+per level and endpoint, throughput and p50/p95/p99 latency, i.e. the
+curves used for capacity planning and regression checks.
+
+By default a server is started in a child process (the `serve` command on
+a free port), so it does not share a GIL with the load generator; the
+fakes from fakes.py stand in for Pinecone, Gemini and the embedding model,
+each with configurable latency. To load-test gunicorn or another
+deployment, start a stub-backed server with the `serve` command (or point
+--url at any instance) and run against it:
+
+  python benchmarks/load_test.py run --concurrency 1 2 4 8 16 32 --duration 20
+  python benchmarks/load_test.py run --rate 20 --mix 0.9 --output load.json
+  python benchmarks/load_test.py serve --port 5002 --llm-latency-ms 800
+  python benchmarks/load_test.py run --url http://localhost:5002
+
+Without --rate every worker sends its next request as soon as the previous
+one returns (closed loop). With --rate, arrivals follow a Poisson process
+at that many requests/s and latency is measured from the scheduled arrival,
+so time spent queued behind busy workers is counted.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import zipfile
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+from fakes import FakeEmbeddings, FakeGeminiModel, FakePineconeIndex
+from embedding_benchmark import synthetic_texts
+from run_benchmarks import isolate_state, load_rag_server
+
+ENDPOINTS = ["chat", "upload"]
+STUB_OPTIONS = ["index_latency_ms", "llm_latency_ms", "embed_ms_per_batch", "embed_ms_per_text", "corpus_size"]
+STARTUP_TIMEOUT = 120.0  # Seconds to wait for a spawned stub server to report ready
+
+
+def make_docx(paragraphs):
+    """Minimal DOCX (just word/document.xml) that docx2txt can read"""
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>"
+        ))
+    return buffer.getvalue()
+
+
+def multipart(field, filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class LoadClient:
+    """Builds and sends /chat and /upload-documents requests"""
+
+    def __init__(self, url, paragraphs_per_upload=40, timeout=120.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.paragraphs_per_upload = paragraphs_per_upload
+        self.queries = synthetic_texts(200, sentences_per_text=1, seed=7)
+        self._uploads = 0
+        self._lock = threading.Lock()
+
+    def _post(self, path, body, content_type):
+        request = urllib.request.Request(self.url + path, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def chat(self, rng):
+        body = json.dumps({"query": rng.choice(self.queries)}).encode("utf-8")
+        return self._post("/chat", body, "application/json")
+
+    def upload(self, rng):
+        # Every upload is a new document, so ingestion is never skipped as unchanged
+        with self._lock:
+            self._uploads += 1
+            seed = 1000 + self._uploads
+        content = make_docx(synthetic_texts(self.paragraphs_per_upload, seed=seed))
+        body, content_type = multipart(
+            "files", f"load-{seed}.docx", content,
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+        return self._post("/upload-documents?sync=true", body, content_type)
+
+
+def run_level(client, concurrency, duration, mix, rate=None, seed=0):
+    """
+    Run one concurrency level for `duration` seconds.
+    Returns {endpoint: [(latency_s, ok), ...]} and the elapsed wall time.
+    """
+    results = {endpoint: [] for endpoint in ENDPOINTS}
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    # Open loop: a shared schedule of Poisson arrival times
+    schedule_lock = threading.Lock()
+    schedule_rng = random.Random(seed)
+    next_arrival = [time.perf_counter()]
+
+    def next_start():
+        if rate is None:
+            return time.perf_counter()
+        with schedule_lock:
+            next_arrival[0] += schedule_rng.expovariate(rate)
+            return next_arrival[0]
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            start = next_start()
+            if start >= deadline:
+                return
+            delay = start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = "chat" if rng.random() < mix else "upload"
+            try:
+                status = getattr(client, endpoint)(rng)
+            except Exception:
+                status = None
+            latency = time.perf_counter() - start
+            with results_lock:
+                results[endpoint].append((latency, status is not None and 200 <= status < 300))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize_level(samples, elapsed):
+    """Throughput (ok req/s) and latency percentiles (ms) of successful requests"""
+    latencies = np.asarray([latency for latency, ok in samples if ok])
+    summary = {
+        "requests": len(samples),
+        "errors": len(samples) - len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+    }
+    for p in (50, 95, 99):
+        summary[f"p{p}_ms"] = float(np.percentile(latencies, p) * 1000) if len(latencies) else None
+    return summary
+
+
+def start_stub_server(args, port):
+    """Serve rag_server (backed by the fakes) from a background thread; returns its URL"""
+    from werkzeug.serving import make_server
+
+    isolate_state(tempfile.mkdtemp(prefix="rag-load-"))
+    embeddings = FakeEmbeddings(ms_per_batch=args.embed_ms_per_batch, ms_per_text=args.embed_ms_per_text)
+    index = FakePineconeIndex(latency_ms=args.index_latency_ms)
+    model = FakeGeminiModel(latency_ms=args.llm_latency_ms)
+    rag_server = load_rag_server(index, embeddings, model)
+
+    # Seed the knowledge base so /chat has context to retrieve
+    rag_server.ingest_chunks(synthetic_texts(args.corpus_size), "load-corpus.txt", "load-corpus", lambda **fields: None)
+
+    server = make_server("127.0.0.1", port, rag_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def spawn_stub_server(args):
+    """Run the `serve` command in a child process on a free port; returns its URL once ready"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)]
+    for option in STUB_OPTIONS:
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    process = subprocess.Popen(command)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Stub server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/ready", timeout=1.0) as response:
+                if response.status == 200:
+                    return url, process
+        except OSError:
+            pass  # Not listening (or not ready) yet
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Stub server not ready after {STARTUP_TIMEOUT:.0f}s")
+
+
+def print_row(concurrency, endpoint, summary):
+    def ms(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+    print(
+        f"{concurrency:>6} {endpoint:<7} {summary['requests']:>8} {summary['errors']:>7} "
+        f"{summary['throughput']:>9.1f} {ms(summary['p50_ms'])} {ms(summary['p95_ms'])} {ms(summary['p99_ms'])}"
+    )
+
+
+def run(args):
+    server = None
+    url = args.url
+    if url is None:
+        url, server = spawn_stub_server(args)
+        print(f"🧪 Stub-backed rag_server on {url} (pid {server.pid})")
+
+    client = LoadClient(url, paragraphs_per_upload=args.upload_paragraphs, timeout=args.timeout)
+    if args.warmup:
+        run_level(client, 1, args.warmup, args.mix)
+
+    mode = f"open loop at {args.rate} req/s" if args.rate else "closed loop"
+    print(f"⏱️ {args.duration:.0f}s per level, {mode}, {args.mix:.0%} /chat\n")
+    print(f"{'conc':>6} {'endpoint':<7} {'requests':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+    curves = []
+    try:
+        for concurrency in args.concurrency:
+            results, elapsed = run_level(client, concurrency, args.duration, args.mix, args.rate, seed=concurrency)
+            level = {"concurrency": concurrency, "elapsed_s": elapsed}
+            for endpoint in ENDPOINTS:
+                if results[endpoint]:
+                    level[endpoint] = summarize_level(results[endpoint], elapsed)
+                    print_row(concurrency, endpoint, level[endpoint])
+            curves.append(level)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "levels": curves}, f, indent=2)
+        print(f"\n💾 Saved curves: {args.output}")
+
+
+def serve(args):
+    url, server = start_stub_server(args, port=args.port)
+    print(f"🧪 Stub-backed rag_server on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--index-latency-ms", type=float, default=20.0, help="fake Pinecone latency per call")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0, help="fake Gemini latency per call")
+    parser.add_argument("--embed-ms-per-batch", type=float, default=5.0, help="fake embedding cost per call")
+    parser.add_argument("--embed-ms-per-text", type=float, default=1.0, help="fake embedding cost per text")
+    parser.add_argument("--corpus-size", type=int, default=1000, help="chunks ingested before the test")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate load and report per-level curves")
+    run_parser.add_argument("--url", help="target server (default: start a stub-backed one in a child process)")
+    run_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    run_parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    run_parser.add_argument("--rate", type=float, help="Poisson arrival rate (req/s); default closed loop")
+    run_parser.add_argument("--mix", type=float, default=0.9, help="fraction of requests sent to /chat")
+    run_parser.add_argument("--upload-paragraphs", type=int, default=40, help="paragraphs per uploaded DOCX")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="seconds of single-client warm-up")
+    run_parser.add_argument("--timeout", type=float, default=120.0)
+    run_parser.add_argument("--output", metavar="PATH", help="save the curves as JSON")
+    add_stub_arguments(run_parser)
+
+    serve_parser = commands.add_parser("serve", help="run a stub-backed rag_server for external load")
+    serve_parser.add_argument("--port", type=int, default=5002)
+    add_stub_arguments(serve_parser)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        if not 0.0 <= args.mix <= 1.0:
+            parser.error("--mix must be between 0 and 1")
+        run(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: concurrent query embeddings with and without micro-batching
+N client threads each embed M distinct queries, first calling the model
+directly (one forward pass per query) and then through
+MicroBatchingEmbeddings. Reports queries/s, latency percentiles and the
+average batch size.
+
+Usage: python benchmarks/micro_batching_benchmark.py [--concurrency 1 8 32] [--queries 20] [--backend torch]
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from batching import MicroBatchingEmbeddings
+from embedding_backends import create_embeddings
+from embedding_benchmark import synthetic_texts
+
+
+def run_clients(embeddings, concurrency, per_client):
+    queries = synthetic_texts(concurrency * per_client, sentences_per_text=1, seed=concurrency)
+
+    def client(offset):
+        latencies = []
+        for query in queries[offset::concurrency]:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [t for result in pool.map(client, range(concurrency)) for t in result]
+    return len(queries) / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--queries", type=int, default=20, help="queries per client")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    model = create_embeddings(args.backend)
+    model.embed_query("warm up")
+
+    print(f"{'clients':>8} {'mode':>8} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+    for concurrency in args.concurrency:
+        batcher = MicroBatchingEmbeddings(model, args.max_batch, args.max_wait_ms)
+        for mode, embeddings in (("direct", model), ("batched", batcher)):
+            qps, latencies = run_clients(embeddings, concurrency, args.queries)
+            p50, p95, p99 = (np.percentile(latencies, q) * 1000 for q in (50, 95, 99))
+            avg_batch = batcher.stats()["avg_batch_size"] if mode == "batched" else 1.0
+            print(f"{concurrency:>8} {mode:>8} {qps:>10.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {avg_batch:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
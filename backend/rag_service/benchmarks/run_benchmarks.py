@@ -0,0 +1,272 @@
+"""
+Offline benchmark suite for RAG ingestion and retrieval
+Times the pipeline stages on synthetic corpora of growing size, with the
+in-process fakes from fakes.py standing in for Pinecone and Gemini (and,
+by default, the embedding model), so no API keys or network are needed:
+- sanitize:  parsing.sanitize_text over every chunk
+- chunking:  RecursiveCharacterTextSplitter as used by parsing.parse_task
+- embedding: embed_documents in EMBED_BATCH_SIZE batches
+- upsert:    rag_server.embed_and_upsert (embedding + batched upserts)
+- retrieve / dedup / clean_context: apis/app.py retrieval helpers, per query
+- chat:      the full /chat request through Flask's test client, per query
+Each result reports p50/p95/p99 latency and throughput. Results can be
+saved as a baseline and later runs compared against it.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 200 1000 5000] [--embeddings fake|torch|onnx]
+       [--only chat retrieve] [--save-baseline benchmarks/baseline.json] [--baseline benchmarks/baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_SERVICE_DIR = os.path.join(BENCH_DIR, "..")
+APP_PATH = os.path.join(RAG_SERVICE_DIR, "..", "..", "apis", "app.py")
+sys.path.insert(0, RAG_SERVICE_DIR)
+sys.path.insert(0, BENCH_DIR)
+from fakes import FakeEmbeddings, FakeGeminiModel, FakePineconeIndex
+from embedding_benchmark import synthetic_texts
+
+BENCHMARKS = ["sanitize", "chunking", "embedding", "upsert", "retrieve", "dedup", "clean_context", "chat"]
+
+
+def summarize(samples, items_per_sample=1):
+    """Latency percentiles (ms) and throughput (items/s) of a list of durations"""
+    samples = np.asarray(samples)
+    return {
+        "p50_ms": float(np.percentile(samples, 50) * 1000),
+        "p95_ms": float(np.percentile(samples, 95) * 1000),
+        "p99_ms": float(np.percentile(samples, 99) * 1000),
+        "throughput": float(items_per_sample * len(samples) / samples.sum()) if samples.sum() > 0 else 0.0,
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def isolate_state(workdir):
+    """Point every persistent path at a scratch directory and disable answer-cache hits"""
+    os.environ.update({
+        "VECTOR_STORE": "numpy",
+        "VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "INGEST_MANIFEST_PATH": os.path.join(workdir, "ingest_manifest.json"),
+        "DEDUP_INDEX_PATH": os.path.join(workdir, "dedup_index.npz"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.jsonl"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache"),
+        "EMBEDDING_CACHE_MAX_MB": "0",
+        "ANSWER_CACHE_THRESHOLD": "1.01",
+        "RERANK_ENABLED": "false",
+    })
+
+
+def load_rag_server(index, embeddings, model):
+    """
+    Import rag_server with the fakes installed as its clients. The fake
+    embedding model is wrapped by rag_server's own client setup (micro-
+    batching, embedding caches), as the real model is in production.
+    """
+    import rag_server
+    rag_server.ingest_manifest.clear()
+    rag_server.dedup_index.clear()
+    rag_server.lexical_index.clear()
+    rag_server.index = index
+    rag_server.embeddings = None
+    rag_server.gemini_model = model
+    create_embeddings = rag_server.create_embeddings
+    rag_server.create_embeddings = lambda *args, **kwargs: embeddings
+    try:
+        rag_server._init_clients(warm=False)
+    finally:
+        rag_server.create_embeddings = create_embeddings
+    rag_server.readiness["ready"] = True
+    return rag_server
+
+
+def load_streamlit_app(index, embeddings, model, lexical_index):
+    """
+    Import apis/app.py (Streamlit runs it in bare mode, so the UI calls are
+    no-ops) and swap its clients for the fakes.
+    """
+    app = sys.modules.get("streamlit_app")
+    if app is None:
+        app = _import_streamlit_app(embeddings)
+    app.index, app.model, app.lexical_index = index, model, lexical_index
+    from caches import CachedEmbeddings, QueryEmbeddingCache
+    app.embeddings = CachedEmbeddings(embeddings, QueryEmbeddingCache())
+    return app
+
+
+def _import_streamlit_app(embeddings):
+    import embedding_backends
+    create_embeddings = embedding_backends.create_embeddings
+    embedding_backends.create_embeddings = lambda *args, **kwargs: embeddings
+    try:
+        spec = importlib.util.spec_from_file_location("streamlit_app", APP_PATH)
+        app = importlib.util.module_from_spec(spec)
+        sys.modules["streamlit_app"] = app
+        spec.loader.exec_module(app)
+    finally:
+        embedding_backends.create_embeddings = create_embeddings
+    return app
+
+
+def make_embeddings(backend):
+    if backend == "fake":
+        return FakeEmbeddings()
+    from embedding_backends import create_embeddings
+    return create_embeddings(backend)
+
+
+def run_size(n, args, embeddings, selected):
+    """Run the selected benchmarks on an n-chunk corpus; returns {name: summary}"""
+    texts = synthetic_texts(n)
+    queries = synthetic_texts(args.queries, sentences_per_text=1, seed=n)
+    results = {}
+
+    if "sanitize" in selected:
+        from parsing import sanitize_text
+        samples = [timed(lambda: [sanitize_text(t) for t in texts])[0] for _ in range(args.repeat)]
+        results["sanitize"] = summarize(samples, n)
+
+    if "chunking" in selected:
+        from langchain_core.documents import Document
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from parsing import CHUNK_OVERLAP, CHUNK_SIZE
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        docs = [Document(page_content="\n\n".join(texts[i:i + 10])) for i in range(0, n, 10)]
+        samples = [timed(splitter.split_documents, docs)[0] for _ in range(args.repeat)]
+        results["chunking"] = summarize(samples, n)
+
+    if "embedding" in selected:
+        samples = []
+        for _ in range(args.repeat):
+            samples.append(sum(
+                timed(embeddings.embed_documents, texts[i:i + args.batch_size])[0]
+                for i in range(0, n, args.batch_size)
+            ))
+        results["embedding"] = summarize(samples, n)
+
+    if not selected & {"upsert", "retrieve", "dedup", "clean_context", "chat"}:
+        return results
+
+    index = FakePineconeIndex(latency_ms=args.index_latency_ms)
+    model = FakeGeminiModel(latency_ms=args.llm_latency_ms)
+    rag_server = load_rag_server(index, embeddings, model)
+    rag_server.ingest_chunks(texts, f"corpus-{n}.txt", f"digest-{n}", lambda **fields: None)
+
+    if "upsert" in selected:
+        records = [
+            {"id": f"bench-{i}", "text": text, "metadata": {"text": text, "source": "bench"}}
+            for i, text in enumerate(texts)
+        ]
+        samples = [timed(rag_server.embed_and_upsert, records)[0] for _ in range(args.repeat)]
+        results["upsert"] = summarize(samples, n)
+        index.delete(ids=[r["id"] for r in records])
+
+    if selected & {"retrieve", "dedup", "clean_context"}:
+        app = load_streamlit_app(index, embeddings, model, rag_server.lexical_index)
+        retrieved = []
+        samples = []
+        for query in queries:
+            elapsed, chunks = timed(app.retrieve_chunks, query)
+            samples.append(elapsed)
+            retrieved.append(chunks)
+        if not any(retrieved):
+            raise RuntimeError("retrieve_chunks returned nothing (it swallows errors; check the app setup)")
+        if "retrieve" in selected:
+            results["retrieve"] = summarize(samples)
+        if "dedup" in selected:
+            results["dedup"] = summarize([timed(app.deduplicate_chunks, chunks)[0] for chunks in retrieved])
+        if "clean_context" in selected:
+            results["clean_context"] = summarize([timed(app.clean_context, chunks)[0] for chunks in retrieved])
+
+    if "chat" in selected:
+        client = rag_server.app.test_client()
+        samples = []
+        for query in queries:
+            elapsed, response = timed(lambda: client.post("/chat", json={"query": query}))
+            if response.status_code != 200:
+                raise RuntimeError(f"/chat returned {response.status_code}: {response.get_data(as_text=True)}")
+            samples.append(elapsed)
+        results["chat"] = summarize(samples)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print per-benchmark p50 and throughput changes; returns the regressed keys"""
+    regressions = []
+    print(f"\n{'benchmark':<22} {'p50 ms':>9} {'base':>9} {'change':>8} {'items/s':>11} {'base':>11}")
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        change = (current["p50_ms"] - base["p50_ms"]) / base["p50_ms"] if base["p50_ms"] else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(
+            f"{key:<22} {current['p50_ms']:>9.2f} {base['p50_ms']:>9.2f} {change:>+7.0%} "
+            f"{current['throughput']:>11.1f} {base['throughput']:>11.1f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--embeddings", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--queries", type=int, default=50, help="queries per size for retrieve/chat")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of the batch benchmarks")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--index-latency-ms", type=float, default=0.0, help="fake Pinecone latency per call")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="fake Gemini latency per call")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    isolate_state(workdir)
+    embeddings = make_embeddings(args.embeddings)
+    selected = set(args.only)
+
+    results = {}
+    print(f"{'benchmark':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'items/s':>11}")
+    for n in args.sizes:
+        for name, summary in run_size(n, args, embeddings, selected).items():
+            key = f"{name}@{n}"
+            results[key] = summary
+            print(
+                f"{key:<22} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+                f"{summary['p99_ms']:>9.2f} {summary['throughput']:>11.1f}"
+            )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"embeddings": args.embeddings, "results": results}, f, indent=2)
+        print(f"\n💾 Saved baseline: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("embeddings") != args.embeddings:
+            print(f"⚠️ Baseline used '{baseline.get('embeddings')}' embeddings, this run '{args.embeddings}'")
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
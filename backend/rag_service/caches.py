@@ -0,0 +1,280 @@
+"""
+In-process caches for the F-Buddy RAG pipeline
+- QueryEmbeddingCache: bounded LRU + TTL cache of query embeddings
+- CachedEmbeddings: embeddings wrapper that serves embed_query(ies) from the cache
+- SemanticAnswerCache: answers reused for queries with near-identical embeddings
+- CorpusStamp: on-disk marker that every ingestion path bumps, so answer
+  caches in other processes notice index changes
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from file_lock import file_version
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation and whitespace so trivial variants share a key"""
+    query = _PUNCTUATION.sub(" ", (query or "").lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache mapping normalized query text to its embedding.
+    Entries expire after `ttl` seconds; the least recently used entry is
+    evicted once `max_size` is reached.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, vector: List[float]):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, query: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Return the cached embedding for query, computing and storing it on a miss"""
+        vector = self.get(query)
+        if vector is None:
+            vector = compute(query)
+            self.put(query, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedEmbeddings:
+    """
+    Drop-in wrapper around a LangChain embeddings object.
+    embed_query and embed_queries go through a QueryEmbeddingCache; the rest
+    (embed_documents, ...) is delegated unchanged.
+    """
+
+    def __init__(self, embeddings, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_compute(text, self.embeddings.embed_query)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, computing every cache miss in a single forward pass"""
+        vectors = [self.cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+            computed = dict(zip(missing, embed(missing)))
+            for text, vector in computed.items():
+                self.cache.put(text, vector)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+
+class CorpusStamp:
+    """
+    Marker file rewritten by every process that changes an index (rag_server
+    workers, the Streamlit app, ingest.py). Its version changes on each bump.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def bump(self):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self.path)
+
+    def read(self):
+        return file_version(self.path)
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of generated answers keyed by query embedding.
+    A lookup hits when a cached query embedding has cosine similarity
+    >= `threshold` with the new one. Every entry is tagged with the index
+    version it was generated against; invalidate() bumps the version and
+    drops all entries, so answers never outlive an index change. With a
+    CorpusStamp, changes made by other processes invalidate the cache on
+    the next lookup too; entries also expire after `ttl` seconds. Entries
+    carry a `scope` (e.g. namespace + metadata filter) and only match
+    lookups with the same scope.
+    Eviction keeps both the entry count and the estimated memory use
+    (vector + serialized answer) under their caps.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: Optional[float] = 3600, stamp: Optional[CorpusStamp] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stamp = stamp
+        self._stamp_seen = stamp.read() if stamp is not None else None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._next_key = 0
+        self._matrix = None
+        self._matrix_keys: List[int] = []
+        self._matrix_scopes: List[str] = []
+        self._matrix_stored = None
+        self._lock = threading.Lock()
+
+    def _rebuild_matrix(self):
+        self._matrix_keys = list(self._entries)
+        self._matrix_scopes = [self._entries[k][3] for k in self._matrix_keys]
+        self._matrix_stored = np.array([self._entries[k][4] for k in self._matrix_keys])
+        if self._matrix_keys:
+            self._matrix = np.stack([self._entries[k][0] for k in self._matrix_keys])
+        else:
+            self._matrix = None
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size, _, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._matrix = None
+
+    def get(self, query_vector, scope: str = "") -> Optional[Dict]:
+        """Return (a copy of) the cached payload closest to query_vector in `scope`, if within threshold"""
+        vec = np.asarray(query_vector, dtype=np.float32)
+        vec = vec / (np.linalg.norm(vec) or 1.0)
+        with self._lock:
+            self._check_stamp()
+            if self._entries:
+                if self._matrix is None:
+                    self._rebuild_matrix()
+                scores = self._matrix @ vec
+                if any(s != scope for s in self._matrix_scopes):
+                    scores = np.where([s == scope for s in self._matrix_scopes], scores, -np.inf)
+                if self.ttl is not None:
+                    scores = np.where(self._matrix_stored > time.monotonic() - self.ttl, scores, -np.inf)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._matrix_keys[best]
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return dict(self._entries[key][1], similarity=float(scores[best]))
+            self.misses += 1
+            return None
+
+    def put(self, query_vector, payload: Dict, version: int, scope: str = ""):
+        """
+        Cache payload for query_vector. `version` is the index version read
+        before retrieval; stale results (index changed meanwhile) are dropped.
+        """
+        vec = np.asarray(query_vector, dtype=np.float32)
+        vec = vec / (np.linalg.norm(vec) or 1.0)
+        size = vec.nbytes + len(json.dumps(payload, default=str))
+        with self._lock:
+            self._check_stamp()
+            if version != self.version or size > self.max_bytes:
+                return
+            self._entries[self._next_key] = (vec, dict(payload), size, scope, time.monotonic())
+            self._next_key += 1
+            self._bytes += size
+            self._matrix = None
+            self._evict()
+
+    def _check_stamp(self):
+        """Invalidate if another process changed the index (caller holds _lock)"""
+        if self.stamp is not None:
+            seen = self.stamp.read()
+            if seen != self._stamp_seen:
+                self._stamp_seen = seen
+                self._clear()
+
+    def _clear(self):
+        self.version += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._matrix = None
+
+    def invalidate(self):
+        """Drop every entry and bump the index version (and the shared stamp)"""
+        with self._lock:
+            if self.stamp is not None:
+                self.stamp.bump()
+                self._stamp_seen = self.stamp.read()
+            self._clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,76 @@
+"""
+Token-budgeted context packing for RAG prompts
+Chunks are added in relevance order until the token budget is reached;
+the chunk that crosses the budget is trimmed at a sentence boundary (the
+top chunk is hard-truncated if no sentence fits) and everything after it
+is left out, so prompt size (and Gemini latency and cost) stays bounded
+no matter how many chunks retrieval returns.
+"""
+
+import re
+from typing import List, NamedTuple, Sequence
+
+CHARS_PER_TOKEN = 4  # Gemini's rule of thumb for English text
+DEFAULT_CONTEXT_TOKENS = 3000
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (no network round trip to count_tokens)"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of whole sentences that fits in max_tokens ("" if none does)"""
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        cost = estimate_tokens(sentence) + (1 if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Prefix of text that fits in max_tokens, cut at a word boundary where possible"""
+    prefix = text[:max(0, max_tokens) * CHARS_PER_TOKEN]
+    if len(prefix) < len(text) and " " in prefix:
+        prefix = prefix.rsplit(" ", 1)[0]
+    return prefix.strip()
+
+
+class PackedContext(NamedTuple):
+    chunks: List[str]  # Packed chunk texts, in relevance order (the last may be trimmed)
+    tokens: int  # Estimated tokens of the joined context
+    trimmed: bool  # True if a chunk was cut short or chunks were left out
+
+
+def pack_context(texts: Sequence[str], max_tokens: int = DEFAULT_CONTEXT_TOKENS, separator: str = "\n\n") -> PackedContext:
+    """Fill up to max_tokens with texts in the given (relevance) order"""
+    separator_tokens = estimate_tokens(separator)
+    chunks = []
+    used = 0
+    for text in texts:
+        gap = separator_tokens if chunks else 0
+        cost = estimate_tokens(text)
+        if used + gap + cost <= max_tokens:
+            chunks.append(text)
+            used += gap + cost
+            continue
+
+        partial = trim_to_tokens(text, max_tokens - used - gap)
+        if not partial and not chunks:
+            # Never send an empty context: cut the top chunk at the budget instead
+            partial = truncate_to_tokens(text, max_tokens)
+        if partial:
+            chunks.append(partial)
+            used += gap + estimate_tokens(partial)
+        return PackedContext(chunks, used, True)
+    return PackedContext(chunks, used, False)
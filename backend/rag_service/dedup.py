@@ -0,0 +1,294 @@
+"""
+Near-duplicate detection for RAG chunks
+Chunks are tokenized once into lowercase word sets, summarized with
+vectorized MinHash signatures and bucketed with LSH banding. Only chunks
+that share a bucket are compared with exact Jaccard similarity, so the
+cost grows roughly linearly with the number of chunks instead of
+quadratically.
+
+SignatureIndex keeps the signatures of everything already ingested (keyed
+by vector id, persisted next to the ingestion manifest) so new chunks can
+be checked, before they are embedded, against every document of the
+namespace. A dropped chunk is replaced by the id of the chunk it copies
+(its canonical chunk) in its document's manifest entry, so each document
+still lists all of its content.
+"""
+
+import os
+import zlib
+import threading
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from file_lock import FileLock, file_version
+
+NUM_PERM = 128  # MinHash permutations per signature
+_PRIME = (1 << 31) - 1
+_MIN_CANDIDATE_PROBABILITY = 0.99
+_BLOCK_TOKENS = 16384
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Lowercase word set of a chunk (same tokens as the old Jaccard check)"""
+    return frozenset(text.lower().split())
+
+
+def shingles(text: str, k: int = 3) -> FrozenSet[str]:
+    """Lowercase word k-shingles; texts shorter than k words fall back to their words"""
+    words = text.lower().split()
+    if len(words) < k:
+        return frozenset(words)
+    return frozenset(" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+
+
+def jaccard(tokens1: FrozenSet[str], tokens2: FrozenSet[str]) -> float:
+    if not tokens1 or not tokens2:
+        return 0.0
+    return len(tokens1 & tokens2) / len(tokens1 | tokens2)
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.int64)
+    b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.int64)
+    return a, b
+
+
+def minhash_signatures(token_sets: Sequence[FrozenSet[str]], num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    """
+    MinHash signatures for many token sets in one vectorized pass.
+    Returns an (n, num_perm) int64 array; rows of empty sets are all -1.
+    """
+    signatures = np.full((len(token_sets), num_perm), -1, dtype=np.int64)
+    non_empty = [i for i, tokens in enumerate(token_sets) if tokens]
+    if not non_empty:
+        return signatures
+
+    a, b = _permutations(num_perm, seed)
+    # Bound the (num_perm x tokens) work matrix by hashing a block of sets at a time
+    block = []
+    block_tokens = 0
+    for i in non_empty + [None]:
+        if i is not None:
+            block.append(i)
+            block_tokens += len(token_sets[i])
+        if block and (i is None or block_tokens >= _BLOCK_TOKENS):
+            # Hash every token once (crc32 is deterministic across processes)
+            hashes = np.fromiter(
+                (zlib.crc32(token.encode("utf-8")) for j in block for token in token_sets[j]),
+                dtype=np.int64,
+                count=block_tokens
+            ) % _PRIME
+            lengths = np.array([len(token_sets[j]) for j in block])
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            permuted = (a * hashes + b) % _PRIME  # (num_perm, tokens in block)
+            signatures[block] = np.minimum.reduceat(permuted, starts, axis=1).T
+            block = []
+            block_tokens = 0
+    return signatures
+
+
+def choose_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows == num_perm: the most selective
+    banding that still makes pairs at `threshold` candidates with >= 99% probability.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= _MIN_CANDIDATE_PROBABILITY:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Incremental LSH index of kept chunks.
+    add() returns the position (in insertion order of kept chunks) of an
+    already-kept near duplicate with Jaccard above `threshold`, or None
+    after keeping the new chunk.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = NUM_PERM):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._tokens: List[FrozenSet[str]] = []
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, tokens: FrozenSet[str], signature: np.ndarray) -> Optional[int]:
+        if not tokens:
+            # Empty chunks are never duplicates (Jaccard is 0)
+            self._tokens.append(tokens)
+            return None
+
+        keys = self._band_keys(signature)
+        seen = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if jaccard(tokens, self._tokens[candidate]) > self.threshold:
+                    return candidate
+
+        position = len(self._tokens)
+        self._tokens.append(tokens)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(position)
+        return None
+
+
+def near_duplicate_filter(texts: Sequence[str], threshold: float = 0.85) -> List[int]:
+    """Positions of texts to keep, in order, dropping any text that near-duplicates an earlier kept one"""
+    token_sets = [tokenize(text) for text in texts]
+    signatures = minhash_signatures(token_sets)
+    index = NearDuplicateIndex(threshold)
+
+    kept = []
+    for position, (tokens, signature) in enumerate(zip(token_sets, signatures)):
+        if index.add(tokens, signature) is None:
+            kept.append(position)
+    return kept
+
+
+class SignatureIndex:
+    """
+    Persistent LSH index of MinHash signatures keyed by vector id.
+    Used at ingest time to find chunks that near-duplicate chunks already
+    ingested. Similarity is estimated from signature agreement, since the
+    original texts are not kept. Stored as an .npz file at `path`; like
+    BM25Index, refresh() picks up other processes' saves and save() merges
+    this instance's unsaved changes into the file under <path>.lock.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, num_perm: int = NUM_PERM):
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock") if path else None
+        self._loaded_version = None
+        self._pending: List[Tuple] = []  # Changes since the last save, replayed onto reloads
+        self._load()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _load(self):
+        version = file_version(self.path)
+        if version is None:
+            return
+        saved = np.load(self.path, allow_pickle=False)
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        if saved["signatures"].shape[1:] == (self.num_perm,):
+            for vector_id, signature in zip(saved["ids"].tolist(), saved["signatures"]):
+                self._insert(vector_id, signature.astype(np.int64))
+        self._loaded_version = version
+        for change in self._pending:
+            self._apply(change)
+
+    def refresh(self):
+        """Reload if another process saved since this instance last loaded or saved"""
+        with self._lock:
+            if self.path and file_version(self.path) not in (None, self._loaded_version):
+                self._load()
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, vector_id: str, signature: np.ndarray):
+        self._signatures[vector_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(vector_id)
+
+    def _apply(self, change: Tuple):
+        op = change[0]
+        if op == "add":
+            if change[1] not in self._signatures:
+                self._insert(change[1], change[2])
+        elif op == "remove":
+            for vector_id in change[1]:
+                self._signatures.pop(vector_id, None)  # Stale bucket entries are skipped on lookup
+        else:
+            self._signatures = {}
+            self._buckets = [{} for _ in range(self.bands)]
+
+    def _change(self, change: Tuple):
+        with self._lock:
+            self._apply(change)
+            if change[0] == "clear":
+                self._pending = []
+            self._pending.append(change)
+
+    def find_duplicate(self, signature: np.ndarray) -> Optional[str]:
+        """Id of an indexed chunk whose estimated Jaccard with `signature` reaches the threshold"""
+        if signature[0] < 0:
+            return None  # Empty text
+        with self._lock:
+            seen = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                for candidate in self._buckets[band].get(key, ()):
+                    if candidate in seen or candidate not in self._signatures:
+                        continue
+                    seen.add(candidate)
+                    if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                        return candidate
+        return None
+
+    def add(self, vector_id: str, signature: np.ndarray):
+        if signature[0] >= 0:
+            self._change(("add", vector_id, signature))
+
+    def remove(self, vector_ids: Sequence[str]):
+        """Forget ids"""
+        self._change(("remove", list(vector_ids)))
+
+    def clear(self):
+        self._change(("clear",))
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock, self._file_lock:
+            self.refresh()
+            ids = list(self._signatures)
+            signatures = (
+                np.stack([self._signatures[i] for i in ids]).astype(np.int32)
+                if ids else np.zeros((0, self.num_perm), dtype=np.int32)
+            )
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, ids=np.array(ids, dtype=str), signatures=signatures)
+            os.replace(tmp_path, self.path)
+            self._loaded_version = file_version(self.path)
+            self._pending = []
+
+
+def suppress_near_duplicates(index: SignatureIndex,
+                             chunks: Sequence[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+    """
+    Check new (id, text) chunks against the index (chunks already ingested
+    from any document) and against each other. Kept chunks are added to the
+    index. Returns (kept chunks, {dropped id: id of the chunk it copies}).
+    """
+    index.refresh()
+    signatures = minhash_signatures([shingles(text) for _, text in chunks], index.num_perm)
+    kept, duplicates = [], {}
+    for (vector_id, text), signature in zip(chunks, signatures):
+        canonical = index.find_duplicate(signature)
+        if canonical is not None:
+            duplicates[vector_id] = canonical
+        else:
+            index.add(vector_id, signature)
+            kept.append((vector_id, text))
+    return kept, duplicates
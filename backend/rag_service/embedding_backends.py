@@ -0,0 +1,142 @@
+"""
+Embedding backends for the RAG pipeline
+"torch" runs sentence-transformers/all-MiniLM-L6-v2 through LangChain's
+HuggingFaceEmbeddings (PyTorch on CPU). "onnx" runs an int8-quantized ONNX
+export of the same model with onnxruntime: mean pooling and L2
+normalization are done here, so both produce normalized 384-d vectors.
+
+Export the ONNX model once with: python embedding_backends.py export
+"""
+
+import os
+import argparse
+from typing import List, Optional
+
+import numpy as np
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_model")
+MAX_SEQ_LENGTH = 256  # Same truncation as the sentence-transformers model
+_ONNX_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+class OnnxEmbeddings:
+    """
+    LangChain-compatible embeddings (embed_documents / embed_query) backed
+    by an onnxruntime session over a MiniLM export from export_onnx().
+    """
+
+    def __init__(self, model_dir: str = DEFAULT_ONNX_DIR, model_file: str = "model.onnx",
+                 batch_size: int = 32, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found: {model_path} (run: python embedding_backends.py export)")
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Normalized (n, 384) float32 embeddings"""
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + self.batch_size])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+
+            # Mean pooling over real tokens, then L2 normalization
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.vstack(vectors) if vectors else np.zeros((0, 384), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+def embedding_model_id(backend: str = "torch") -> str:
+    """Identifies the vectors a backend produces (cache keys must not mix backends)"""
+    backend = (backend or "torch").lower()
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}@{backend}-int8"
+
+
+def create_embeddings(backend: str = "torch", onnx_dir: Optional[str] = None, threads: Optional[int] = None):
+    """Embeddings object for the configured backend ("torch" or "onnx")"""
+    backend = (backend or "torch").lower()
+    if backend == "torch":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True}
+        )
+    if backend == "onnx":
+        return OnnxEmbeddings(onnx_dir or DEFAULT_ONNX_DIR, threads=threads)
+    raise ValueError(f"Unknown embedding backend: {backend!r} (expected 'torch' or 'onnx')")
+
+
+def export_onnx(output_dir: str = DEFAULT_ONNX_DIR, model_name: str = EMBEDDING_MODEL, quantize: bool = True) -> str:
+    """
+    Export the transformer to ONNX (model_fp32.onnx) plus its tokenizer and,
+    with quantize, a dynamically int8-quantized model.onnx. Needs torch,
+    transformers and onnxruntime; only the latter two are needed at runtime.
+    """
+    import shutil
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+    dummy = tokenizer(["export the embedding model"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in _ONNX_INPUTS),
+            fp32_path,
+            input_names=_ONNX_INPUTS,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in _ONNX_INPUTS + ["last_hidden_state"]},
+            opset_version=14
+        )
+
+    model_path = os.path.join(output_dir, "model.onnx")
+    if quantize:
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+    else:
+        shutil.copyfile(fp32_path, model_path)
+    return model_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export all-MiniLM-L6-v2 to (int8) ONNX")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--output", default=DEFAULT_ONNX_DIR)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    path = export_onnx(args.output, quantize=not args.no_quantize)
+    print(f"✅ Exported ONNX model: {path}")
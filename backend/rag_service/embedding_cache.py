@@ -0,0 +1,203 @@
+"""
+Persistent, memory-mapped embedding cache shared by every ingestion path
+Vectors are keyed by a hash of (embedding model id, chunk text), so
+re-ingesting a file, switching chunkers or rebuilding the vector store
+reuses vectors computed by rag_server, the Streamlit app or ingest.py.
+
+Each (dimension, capacity) pair gets its own directory under `path`
+(e.g. d384-c174762), so a process configured with a different size opens a
+separate cache instead of resizing files other processes have mapped.
+Layout of that directory:
+- vectors.f32: (capacity, dimension) float32 memmap
+- keys.bin:    (capacity, 16) key digest per row (all zeros = empty row)
+- ticks.i64:   last use of each row (ns), for least-recently-used eviction
+- meta.json:   dimension, capacity and a generation bumped on every write
+Writers serialize on an flock'd lock file (where available). Readers take
+no lock: a row's key is checked before and after its vector is copied, so
+a row being recycled by another process reads as a miss, never as the
+wrong vector.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from file_lock import FileLock
+
+KEY_BYTES = 16
+
+
+def cache_key(model_id: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+
+class PersistentEmbeddingCache:
+    """On-disk LRU of embedding vectors, bounded to `max_bytes` of vectors"""
+
+    def __init__(self, path: str, model_id: str, dimension: int = 384, max_bytes: int = 256 * 1024 * 1024):
+        self.model_id = model_id
+        self.dimension = dimension
+        self.capacity = max(1, max_bytes // (dimension * 4))
+        self.path = os.path.join(path, f"d{dimension}-c{self.capacity}")
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._generation = None
+        os.makedirs(self.path, exist_ok=True)
+
+        with self._write_lock():
+            # meta.json is written last, so without it no other process has the files mapped yet
+            meta = self._read_meta()
+            ready = meta.get("dimension") == dimension and meta.get("capacity") == self.capacity
+            mode = "r+" if ready else "w+"
+            self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode=mode, shape=(self.capacity, dimension))
+            self._keys = np.memmap(self._file("keys.bin"), dtype=np.uint8, mode=mode, shape=(self.capacity, KEY_BYTES))
+            self._ticks = np.memmap(self._file("ticks.i64"), dtype=np.int64, mode=mode, shape=(self.capacity,))
+            if mode == "w+":
+                self._write_meta({"dimension": dimension, "capacity": self.capacity, "generation": 0})
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: Dict):
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _write_lock(self):
+        return FileLock(self._file("lock"), self._lock)
+
+    def _refresh(self, force: bool = False):
+        """Rebuild the key -> row map if another writer bumped the generation"""
+        generation = self._read_meta().get("generation")
+        if force or generation != self._generation:
+            occupied = np.flatnonzero(self._keys.any(axis=1))
+            self._rows = {self._keys[row].tobytes(): int(row) for row in occupied}
+            self._generation = generation
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None"""
+        self._refresh()
+        now = time.time_ns()
+        results = []
+        for text in texts:
+            key = cache_key(self.model_id, text)
+            row = self._rows.get(key)
+            vector = None
+            if row is not None and self._keys[row].tobytes() == key:
+                vector = np.array(self._vectors[row])
+                if self._keys[row].tobytes() == key:
+                    self._ticks[row] = now
+                else:
+                    vector = None  # Recycled while we were reading
+            results.append(vector)
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors, evicting the least recently used rows when full"""
+        with self._write_lock():
+            self._refresh(force=True)
+            new = {}
+            for text, vector in zip(texts, vectors):
+                key = cache_key(self.model_id, text)
+                if key not in self._rows:
+                    new[key] = vector
+            if not new:
+                return
+
+            items = list(new.items())[-self.capacity:]
+            free = np.flatnonzero(~self._keys.any(axis=1))
+            rows = list(free[:len(items)])
+            if len(rows) < len(items):
+                occupied = np.flatnonzero(self._keys.any(axis=1))
+                oldest = occupied[np.argsort(self._ticks[occupied], kind="stable")[:len(items) - len(rows)]]
+                rows.extend(oldest)
+                self.evictions += len(oldest)
+
+            now = time.time_ns()
+            for (key, vector), row in zip(items, rows):
+                old_key = self._keys[row].tobytes()
+                self._rows.pop(old_key, None)
+                self._keys[row] = 0  # Invalidate before overwriting the vector
+                self._vectors[row] = np.asarray(vector, dtype=np.float32)
+                self._keys[row] = np.frombuffer(key, dtype=np.uint8)
+                self._ticks[row] = now
+                self._rows[key] = int(row)
+
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+            meta = self._read_meta()
+            meta.update(dimension=self.dimension, capacity=self.capacity, generation=(meta.get("generation") or 0) + 1)
+            self._write_meta(meta)
+            self._generation = meta["generation"]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCachedEmbeddings:
+    """
+    Drop-in wrapper around a LangChain embeddings object.
+    embed_documents reads hits from a PersistentEmbeddingCache and only
+    embeds (and stores) the misses; everything else is delegated unchanged.
+    """
+
+    def __init__(self, embeddings, cache: PersistentEmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() if isinstance(vector, np.ndarray) else list(vector) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """One forward pass for many queries, bypassing the (chunk) cache"""
+        return self.embeddings.embed_documents(list(texts))
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            **self.cache.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,56 @@
+"""
+Cross-process locking for state files shared by rag_server, its gunicorn
+workers, the Streamlit app and ingest.py
+"""
+
+import os
+import threading
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+
+class FileLock:
+    """
+    Exclusive lock held by one thread of one process at a time.
+    Processes serialize on an flock'd lock file (where available); threads
+    of this process on `thread_lock`. Not re-entrant.
+    """
+
+    def __init__(self, path: str, thread_lock: Optional[threading.Lock] = None):
+        self.path = path
+        self.thread_lock = thread_lock or threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                self._file = open(self.path, "a")
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self.thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.thread_lock.release()
+
+
+def file_version(path: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """(inode, mtime, size) of a file, or None; changes whenever it is rewritten or replaced"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for the F-Buddy RAG service
+Sizing profile (override with the environment variables below):
+- RAG_WORKERS: processes serving requests. Each adds only its private
+  memory (~150-250 MB) since MiniLM weights are loaded before the fork
+  and shared. Default: half the cores, at least 1. Index state, job
+  progress (so any worker answers /jobs/<id>) and answer-cache
+  invalidation are shared through files; /metrics is per worker.
+- RAG_THREADS: threads per worker. /chat mostly waits on Pinecone and
+  Gemini, so a few threads per worker keep the cores busy. Default: 4.
+- TORCH_THREADS: torch intra-op threads per worker. Keep
+  RAG_WORKERS * TORCH_THREADS <= cores so workers do not oversubscribe
+  the CPU while embedding. Default: cores // RAG_WORKERS.
+"""
+
+import os
+
+_cores = os.cpu_count() or 1
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:5002")
+workers = int(os.getenv("RAG_WORKERS", str(max(1, _cores // 2))))
+threads = int(os.getenv("RAG_THREADS", "4"))
+worker_class = "gthread"
+preload_app = True  # Load models once, before forking workers (see wsgi.py)
+timeout = 120  # Ingestion with ?sync=true can take a while
+graceful_timeout = 30
+torch_threads = int(os.getenv("TORCH_THREADS", str(max(1, _cores // workers))))
+
+
+def post_fork(server, worker):
+    import rag_server
+    rag_server.after_fork(torch_threads=torch_threads)
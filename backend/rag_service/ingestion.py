@@ -0,0 +1,123 @@
+"""
+Incremental ingestion pipeline shared by rag_server, the Streamlit app and
+ingest.py
+Every path ingests a parsed document the same way: diff its chunks against
+the manifest, drop near-duplicates, embed and upsert the new chunks, delete
+orphaned ones, update the BM25 index, record the manifest entry and tell
+other processes the corpus changed. If any chunk failed to upload, the
+orphans are kept (vectors, BM25 postings and manifest ids) so the next run
+of the file retries the failed chunks and then cleans up. Near-duplicates
+of chunks in other documents are not embedded: the document's manifest
+entry lists the existing chunk instead, and a chunk is only deleted once
+no manifest entry lists it.
+"""
+
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from vector_store import delete_vectors
+from manifest import IngestManifest, namespaced_source
+from dedup import SignatureIndex, suppress_near_duplicates
+from lexical_index import BM25Index
+
+
+class IngestResult(NamedTuple):
+    chunk_ids: List[str]  # Ids of the document's chunks now in the index
+    upserted: int
+    unchanged: int
+    duplicates: int  # Near-duplicate chunks dropped before embedding
+    deleted: int  # Orphaned chunks deleted from the index
+    failed_ids: List[str]
+    elapsed: float  # Seconds spent embedding and upserting
+
+
+def ingest_texts(
+    texts: Sequence[str],
+    filename: str,
+    digest: Optional[str],
+    params: Dict,
+    index,
+    manifest: IngestManifest,
+    lexical_index: BM25Index,
+    upsert_records: Callable[[List[Dict]], Tuple[int, List[str]]],
+    dedup_index: Optional[SignatureIndex] = None,
+    namespace: str = "",
+    metadata: Optional[Dict] = None,
+    report: Optional[Callable] = None,
+    on_change: Optional[Callable[[], None]] = None,
+) -> IngestResult:
+    """
+    Ingest the parsed chunk texts of one file into `namespace`.
+    upsert_records(records) embeds and upserts [{"id", "text", "metadata"}]
+    and returns (number upserted, failed ids). Chunk metadata is the text,
+    the source filename and `metadata`. `dedup_index` is None when
+    near-duplicate suppression is disabled; `report(**fields)` receives
+    progress and `on_change()` runs whenever the index may have changed.
+    """
+    source = namespaced_source(filename, namespace)
+    chunk_ids, new_chunks, orphan_ids = manifest.plan(source, texts)
+    unchanged = len(chunk_ids) - len(new_chunks)
+
+    # Drop near-duplicates of chunks already ingested (from any document) and
+    # list the chunk each one copies instead, so this entry keeps referencing it
+    duplicates = {}
+    if dedup_index is not None:
+        new_chunks, duplicates = suppress_near_duplicates(dedup_index, new_chunks)
+        if duplicates:
+            chunk_ids = list(dict.fromkeys(duplicates.get(cid, cid) for cid in chunk_ids))
+            kept = set(chunk_ids)
+            orphan_ids = [cid for cid in orphan_ids if cid not in kept]
+
+    records = [
+        {"id": cid, "text": text, "metadata": {"text": text, "source": filename, **(metadata or {})}}
+        for cid, text in new_chunks
+    ]
+    if report is not None:
+        report(
+            stage="embedding",
+            chunks=len(records),
+            unchanged_chunks=unchanged,
+            duplicate_chunks=len(duplicates),
+            deleted_chunks=len(orphan_ids)
+        )
+    if not records and not orphan_ids:
+        manifest.record(source, digest, params, chunk_ids)
+        return IngestResult(chunk_ids, 0, unchanged, len(duplicates), 0, [], 0.0)
+
+    try:
+        start = time.perf_counter()
+        upserted, failed_ids = upsert_records(records) if records else (0, [])
+        elapsed = time.perf_counter() - start
+        failed = set(failed_ids)
+
+        # Orphans are only deleted once every new chunk is in the index, and
+        # only if no other document lists them (as the chunk it duplicates)
+        deleted = [] if failed else manifest.unreferenced(orphan_ids, source)
+        delete_vectors(index, deleted, namespace=namespace)
+        if dedup_index is not None:
+            # Failed chunks are not in the index, so they must not suppress later copies
+            dedup_index.remove(list(failed) + deleted)
+
+        # Keep the BM25 index in step with the vector store
+        for record in records:
+            if record["id"] not in failed:
+                lexical_index.add(record["id"], record["metadata"])
+        lexical_index.remove(deleted)
+        lexical_index.save()
+
+        chunk_ids = [cid for cid in chunk_ids if cid not in failed]
+        if failed:
+            # Without the digest, ingesting the file again retries the failed chunks
+            manifest.record(source, None, params, chunk_ids + orphan_ids)
+        else:
+            manifest.record(source, digest, params, chunk_ids)
+        return IngestResult(chunk_ids, upserted, unchanged, len(duplicates), len(deleted), list(failed_ids), elapsed)
+    except Exception:
+        if dedup_index is not None:
+            dedup_index.remove([cid for cid, _ in new_chunks])
+        raise
+    finally:
+        if dedup_index is not None:
+            dedup_index.save()
+        if on_change is not None:
+            on_change()
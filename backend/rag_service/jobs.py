@@ -0,0 +1,199 @@
+"""
+Background ingestion jobs for the F-Buddy RAG service
+Uploads are accepted immediately and processed by a bounded worker pool;
+progress is tracked per file so clients can poll /jobs/<id>. With a state
+directory, every job is also written to <dir>/<id>.json as it progresses,
+so any gunicorn worker (not just the one running the job) can report it.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from file_lock import FileLock
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_PARTIAL = "partial"  # Some files were ingested, others failed
+JOB_FAILED = "failed"
+JOB_FINISHED = (JOB_COMPLETED, JOB_PARTIAL, JOB_FAILED)
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class IngestionJob:
+    """Progress of one upload batch: overall status plus per-file stage"""
+
+    def __init__(self, filenames: List[str]):
+        self.id = uuid.uuid4().hex
+        self.status = JOB_QUEUED
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self._lock = threading.Lock()
+        self.path = None  # Set by JobQueue.submit when jobs are shared through files
+        self.files = [
+            {"filename": name, "stage": JOB_QUEUED, "chunks": 0, "success": None}
+            for name in filenames
+        ]
+
+    def update_file(self, position: int, **fields):
+        """Update the progress record of the file at `position`"""
+        with self._lock:
+            self.files[position].update(fields)
+            self._save()
+
+    def _set_status(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == JOB_RUNNING:
+                self.started_at = datetime.now().isoformat()
+                self._started = time.perf_counter()
+            elif status in JOB_FINISHED:
+                self.finished_at = datetime.now().isoformat()
+            self._save()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED
+
+    def outcome(self) -> str:
+        """Final status from the per-file results: completed, partial or failed"""
+        with self._lock:
+            succeeded = sum(1 for f in self.files if f["success"])
+        if succeeded == len(self.files):
+            return JOB_COMPLETED
+        return JOB_PARTIAL if succeeded else JOB_FAILED
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict:
+        files = [dict(f) for f in self.files]
+        total_chunks = sum(f.get("chunks", 0) for f in files if f.get("success"))
+        elapsed = sum(f.get("elapsed", 0.0) for f in files)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files": files,
+            "files_done": sum(1 for f in files if f["success"] is not None),
+            "total_files": len(files),
+            "total_chunks": total_chunks,
+            "duplicate_chunks": sum(f.get("duplicate_chunks", 0) for f in files),
+            "failed_chunks": sum(f.get("failed_chunks", 0) for f in files),
+            "chunks_per_sec": round(total_chunks / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    def _save(self):
+        """Replace the job file with the current state (caller holds _lock); readers never see a partial file"""
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp_path, self.path)
+
+
+class JobQueue:
+    """
+    Bounded worker pool for ingestion jobs.
+    At most `max_workers` jobs run at once; the rest wait in the executor
+    queue. Only the newest `max_jobs` jobs are kept for polling. Jobs are
+    shared with other processes through `state_dir` when one is given;
+    pruning the job files there holds <state_dir>/.lock.
+    """
+
+    def __init__(self, max_workers: int = 1, max_jobs: int = 100, state_dir: Optional[str] = None):
+        self.max_jobs = max_jobs
+        self.state_dir = state_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file_lock = None
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self._file_lock = FileLock(os.path.join(state_dir, ".lock"))
+
+    def submit(self, job: IngestionJob, work: Callable[[IngestionJob], None]) -> IngestionJob:
+        """Queue `work(job)` on the pool and register the job for polling"""
+        if self.state_dir:
+            with job._lock:
+                job.path = self._path(job.id)
+                job._save()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        if self.state_dir:
+            self._prune_files()
+        self._executor.submit(self.run, job, work)
+        return job
+
+    @staticmethod
+    def run(job: IngestionJob, work: Callable[[IngestionJob], None]):
+        """Run a job to completion on the current thread"""
+        job._set_status(JOB_RUNNING)
+        try:
+            work(job)
+            status = job.outcome()
+            job._set_status(status, "No file was ingested" if status == JOB_FAILED else None)
+        except Exception as e:
+            print(f"❌ Ingestion job {job.id} failed: {str(e)}")
+            job._set_status(JOB_FAILED, str(e))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Progress of a job run by this process or, via its job file, by another one"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not self.state_dir or not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_jobs"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [jid for jid, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def _prune_files(self):
+        """Delete the oldest finished job files (of any process) beyond max_jobs"""
+        with self._file_lock:
+            names = [name for name in os.listdir(self.state_dir) if name.endswith(".json")]
+            excess = len(names) - self.max_jobs
+            if excess <= 0:
+                return
+            paths = sorted((os.path.join(self.state_dir, name) for name in names), key=os.path.getmtime)
+            for path in paths:
+                if excess <= 0:
+                    break
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        finished = json.load(f).get("status") in JOB_FINISHED
+                    if finished:
+                        os.unlink(path)
+                        excess -= 1
+                except (OSError, ValueError):
+                    continue
@@ -0,0 +1,230 @@
+"""
+Local BM25 inverted index for hybrid (lexical + vector) retrieval
+Dense MiniLM search misses exact terms such as "80C", "ELSS" or account
+names; this index is built alongside the vector store at ingest time and
+its results are merged with the vector matches by reciprocal rank fusion.
+Keep one index per vector-store namespace (see vector_store.partition_path).
+"""
+
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from file_lock import FileLock, file_version
+from vector_store import matches_filter
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_COMPACT_MIN_ENTRIES = 4096  # Log lines tolerated beyond 2x the indexed chunks before compacting
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its my of on or "
+    "should so that the their this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms without stopwords ("Section 80C" -> ["section", "80c"])"""
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory BM25 index over chunk texts, persisted at `path` as an
+    append-only JSON-lines log of added chunks (id + metadata) and removals,
+    compacted once mostly superseded; postings are rebuilt from it on load.
+    A save appends only the changes made since the last one, and other
+    processes replay just the lines appended since they last looked (the
+    whole log only after a compaction). save() holds <path>.lock.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(path + ".lock") if path else None
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._pending: List[Tuple] = []  # Changes since the last save, replayed onto reloads
+        self._reset()
+        if path and os.path.exists(path):
+            with self._lock, self._file_lock:
+                self._migrate_json()
+        with self._lock:
+            self._refresh()
+
+    def _reset(self):
+        self._docs: Dict[str, Dict] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def _migrate_json(self):
+        """Convert an index saved in the old whole-file {"docs": {...}} format to the log"""
+        with open(self.path, "rb") as f:
+            legacy = f.read(8) == b'{"docs":'
+        if legacy:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for doc_id, metadata in json.load(f).get("docs", {}).items():
+                    self._index(doc_id, metadata)
+            self._compact()
+
+    def _refresh(self):
+        """Replay log lines appended (by any process) since the last refresh (caller holds _lock)"""
+        version = file_version(self.path)
+        if version is None or (version[0] == self._log_inode and version[2] == self._log_offset):
+            return
+        with open(self.path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._log_inode:
+                # First load, or another process compacted the log: replay it all
+                self._reset()
+                self._log_inode, self._log_offset, self._log_entries = inode, 0, 0
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # A line still being appended is read next time
+        lines = data[:end].splitlines()
+        for line in lines:
+            entry = json.loads(line)
+            if "id" in entry:
+                self._apply(("add", entry["id"], entry["metadata"]))
+            else:
+                self._apply(("remove", entry["remove"]))
+        self._log_offset += end
+        self._log_entries += len(lines)
+        # Unsaved changes of this instance come after what others saved
+        for change in self._pending:
+            self._apply(change)
+
+    def _compact(self):
+        """Rewrite the log as one line per indexed chunk"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, metadata in self._docs.items():
+                f.write(json.dumps({"id": doc_id, "metadata": metadata}) + "\n")
+        os.replace(tmp_path, self.path)
+        inode, _, size = file_version(self.path)
+        self._log_inode, self._log_offset, self._log_entries = inode, size, len(self._docs)
+
+    def _apply(self, change: Tuple):
+        op = change[0]
+        if op == "add":
+            self._unindex(change[1])
+            self._index(change[1], change[2])
+        elif op == "remove":
+            for doc_id in change[1]:
+                self._unindex(doc_id)
+        else:
+            self._reset()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _index(self, doc_id: str, metadata: Dict):
+        terms = Counter(tokenize(metadata.get("text", "")))
+        self._docs[doc_id] = metadata
+        self._lengths[doc_id] = sum(terms.values())
+        self._total_length += self._lengths[doc_id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _unindex(self, doc_id: str):
+        metadata = self._docs.pop(doc_id, None)
+        if metadata is None:
+            return
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in set(tokenize(metadata.get("text", ""))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _change(self, change: Tuple):
+        with self._lock:
+            self._apply(change)
+            if change[0] == "clear":
+                self._pending = []
+            self._pending.append(change)
+
+    def add(self, doc_id: str, metadata: Dict):
+        """Index (or re-index) a chunk; metadata must contain 'text'"""
+        self._change(("add", doc_id, metadata))
+
+    def remove(self, doc_ids: Sequence[str]):
+        self._change(("remove", list(doc_ids)))
+
+    def clear(self):
+        self._change(("clear",))
+
+    def save(self):
+        """Append this instance's unsaved changes to the log"""
+        if not self.path:
+            return
+        with self._lock, self._file_lock:
+            self._refresh()
+            if any(change[0] == "clear" for change in self._pending):
+                self._compact()
+            elif self._pending:
+                entries = []
+                for change in self._pending:
+                    if change[0] == "add":
+                        entries.append({"id": change[1], "metadata": change[2]})
+                    elif change[1]:
+                        entries.append({"remove": change[1]})
+                with open(self.path, "ab") as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8"))
+                    self._log_offset = f.tell()
+                self._log_inode = file_version(self.path)[0]
+                self._log_entries += len(entries)
+                if self._log_entries > 2 * len(self._docs) + _COMPACT_MIN_ENTRIES:
+                    self._compact()
+            self._pending = []
+
+    def search(self, query: str, top_k: int = 10, filter: Optional[Dict] = None) -> List[Dict]:
+        """Top-k chunks by BM25 score (optionally metadata-filtered), as Pinecone-style matches"""
+        with self._lock:
+            if self.path:
+                self._refresh()
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            if filter:
+                scores = {doc_id: score for doc_id, score in scores.items() if matches_filter(self._docs[doc_id], filter)}
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [{"id": doc_id, "score": score, "metadata": self._docs[doc_id]} for doc_id, score in best]
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Dict]], top_k: int = 10, k: int = 60) -> List[Dict]:
+    """
+    Merge ranked match lists: score(d) = sum over lists of 1 / (k + rank).
+    Matches are identified by 'id'; the first list that has a match supplies
+    its metadata. Returns matches with 'score' set to the fused score.
+    """
+    fused: Dict[str, Dict] = {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {"id": match["id"], "score": 0.0, "metadata": match.get("metadata")}
+            elif not entry["metadata"]:
+                entry["metadata"] = match.get("metadata")
+            entry["score"] += 1.0 / (k + rank)
+    return heapq.nlargest(top_k, fused.values(), key=lambda entry: entry["score"])
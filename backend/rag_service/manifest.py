@@ -0,0 +1,138 @@
+"""
+Ingestion manifest for incremental, idempotent RAG ingestion
+Tracks, per source document, the content hash of the file, the chunking
+parameters and the deterministic ids of the chunks it produced. Re-ingesting
+an unchanged file is skipped; for a changed file only new chunks are
+embedded and chunks that disappeared are reported as orphans to delete.
+An entry may also list another document's chunk that one of its chunks
+near-duplicates, so an id is only deleted once no entry lists it.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from file_lock import FileLock, file_version
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Deterministic vector id for a chunk of a source document"""
+    return hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def namespaced_source(source: str, namespace: str = "") -> str:
+    """Manifest key of a source ingested into a namespace (ids differ per namespace too)"""
+    return f"{namespace}/{source}" if namespace else source
+
+
+def source_digest(source) -> str:
+    """SHA-256 of a document given as a path, bytes-like object or binary file object"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(_HASH_BLOCK), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    JSON-backed record of what has been ingested into one vector index.
+    Shared by threads and processes: reads pick up changes other writers
+    saved, and every write reloads the file under a lock (<path>.lock) and
+    replaces only its own entry, so concurrent writers keep each other's.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path + ".lock")
+        self._files: Dict[str, Dict] = {}
+        self._version = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._reload()
+
+    def _reload(self):
+        """Re-read the file if another writer replaced it (caller holds _lock)"""
+        version = file_version(self.path)
+        if version != self._version:
+            files = {}
+            if version is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    files = json.load(f).get("files", {})
+            self._files = files
+            self._version = version
+
+    def is_unchanged(self, source: str, digest: str, params: Dict) -> bool:
+        """True if `source` was already ingested from identical content and parameters"""
+        with self._lock:
+            self._reload()
+            entry = self._files.get(source)
+            return entry is not None and entry["digest"] == digest and entry["params"] == params
+
+    def plan(self, source: str, texts: List[str]) -> Tuple[List[str], List[Tuple[str, str]], List[str]]:
+        """
+        Diff freshly parsed chunk texts against the manifest.
+        Returns (all chunk ids in order, [(id, text)] to embed, orphaned ids to delete).
+        Identical chunks within a document collapse to a single id.
+        """
+        chunks = OrderedDict()
+        for text in texts:
+            chunks.setdefault(chunk_id(source, text), text)
+
+        with self._lock:
+            self._reload()
+            known = set(self._files.get(source, {}).get("chunk_ids", []))
+        new = [(cid, text) for cid, text in chunks.items() if cid not in known]
+        orphans = [cid for cid in known if cid not in chunks]
+        return list(chunks), new, orphans
+
+    def record(self, source: str, digest: str, params: Dict, chunk_ids: List[str]):
+        """Store the result of a successful ingestion of `source`"""
+        with self._lock, self._file_lock:
+            self._reload()
+            self._files[source] = {"digest": digest, "params": params, "chunk_ids": chunk_ids}
+            self._save()
+
+    def unreferenced(self, chunk_ids: List[str], source: str) -> List[str]:
+        """
+        The ids no entry other than `source` lists. Near-duplicate chunks are
+        shared between documents, so only these may be deleted from the index.
+        """
+        with self._lock:
+            self._reload()
+            referenced = {
+                cid for other, entry in self._files.items() if other != source for cid in entry["chunk_ids"]
+            }
+        return [cid for cid in chunk_ids if cid not in referenced]
+
+    def chunk_ids(self, source: str) -> List[str]:
+        with self._lock:
+            self._reload()
+            return list(self._files.get(source, {}).get("chunk_ids", []))
+
+    def clear(self):
+        """Forget everything (e.g. after the index was wiped)"""
+        with self._lock, self._file_lock:
+            self._files = {}
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self._files}, f)
+        os.replace(tmp_path, self.path)
+        self._version = file_version(self.path)
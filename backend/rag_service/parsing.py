@@ -0,0 +1,97 @@
+"""
+Document parsing and chunking for F-Buddy RAG ingestion
+Functions here run inside worker processes, so they only depend on the
+document loaders and the text splitter (never on the Flask app or models).
+Large PDFs are split into page ranges so one file can use several cores.
+
+A document source is a file path, raw bytes (bytes/bytearray/memoryview)
+or a seekable binary file object, so uploads held in memory are parsed
+without a temp-file round trip: rag_server passes small uploads as bytes
+(large ones as a path), the Streamlit app its in-memory upload object.
+"""
+
+import io
+import re
+from typing import List, Optional, Tuple, Union
+
+import docx2txt
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+PDF_PAGES_PER_TASK = 20  # Page-range size when fanning out a large PDF
+
+Source = Union[str, bytes, bytearray, memoryview, io.IOBase]
+
+# (source, filename, page range or None for the whole file)
+ParseTask = Tuple[Source, str, Optional[Tuple[int, int]]]
+
+
+def sanitize_text(text: str) -> str:
+    """Sanitize text to remove problematic characters"""
+    if not text:
+        return ""
+    # Remove non-ASCII characters
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    # Remove control characters except newlines
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    return text.strip()
+
+
+def open_source(source: Source):
+    """Return something the PDF/DOCX readers accept: a path or a file object at offset 0"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+
+def plan_parse_tasks(source: Source, filename: str, pages_per_task: int = PDF_PAGES_PER_TASK) -> List[ParseTask]:
+    """
+    Split a file into independent parse tasks, in document order.
+    Counting a PDF's pages reads the file, so rag_server runs this in a
+    worker too.
+    """
+    if not filename.lower().endswith('.pdf'):
+        return [(source, filename, None)]
+
+    page_count = len(PdfReader(open_source(source)).pages)
+    return [
+        (source, filename, (start, min(start + pages_per_task, page_count)))
+        for start in range(0, max(page_count, 1), pages_per_task)
+    ]
+
+
+def load_documents(source: Source, filename: str, page_range: Optional[Tuple[int, int]] = None) -> List[Document]:
+    """Load a DOCX file, or a range of PDF pages, as LangChain documents"""
+    if not filename.lower().endswith('.pdf'):
+        # Same output as Docx2txtLoader
+        return [Document(page_content=docx2txt.process(open_source(source)), metadata={"source": filename})]
+
+    # Same output as PyPDFLoader (one document per page), restricted to the range
+    reader = PdfReader(open_source(source))
+    start, end = page_range or (0, len(reader.pages))
+    return [
+        Document(page_content=reader.pages[page].extract_text(), metadata={"source": filename, "page": page})
+        for page in range(start, min(end, len(reader.pages)))
+    ]
+
+
+def parse_task(task: ParseTask, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Load and chunk one task; returns the sanitized, non-empty chunk texts in order"""
+    source, filename, page_range = task
+    docs = load_documents(source, filename, page_range)
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    texts = []
+    for doc in splitter.split_documents(docs):
+        text = sanitize_text(doc.page_content)
+        if text:
+            texts.append(text)
+    return texts
@@ -5,18 +5,38 @@
 """
 
 import os
+import json
 import uuid
-import re
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import google.generativeai as genai
 from werkzeug.utils import secure_filename
+from vector_store import (
+    EMBEDDING_DIM, check_filter, check_namespace, index_state_dir, namespace_counts, open_vector_store,
+    partition_path
+)
+from caches import CachedEmbeddings, CorpusStamp, QueryEmbeddingCache, SemanticAnswerCache
+from jobs import IngestionJob, JobQueue, JOB_COMPLETED
+from parsing import CHUNK_OVERLAP, CHUNK_SIZE, PDF_PAGES_PER_TASK, parse_task, plan_parse_tasks
+from manifest import IngestManifest, namespaced_source, source_digest
+from dedup import SignatureIndex
+from ingestion import ingest_texts
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from reranker import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from context_packing import DEFAULT_CONTEXT_TOKENS, pack_context
+from embedding_backends import DEFAULT_ONNX_DIR, create_embeddings, embedding_model_id
+from embedding_cache import DiskCachedEmbeddings, PersistentEmbeddingCache
+from batching import MicroBatchingEmbeddings
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from upserts import DEFAULT_BATCH_BYTES, Upserter
 
 # Load environment variables
 load_dotenv()
@@ -25,9 +45,47 @@
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "fbuddy-rag")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()  # pinecone | numpy | ivf
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(os.path.dirname(__file__), 'vector_store'))
+INDEX_STATE_DIR = index_state_dir(VECTOR_STORE, PINECONE_INDEX_NAME, VECTOR_STORE_PATH, os.path.dirname(__file__))
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(INDEX_STATE_DIR, 'ingest_manifest.json'))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join(INDEX_STATE_DIR, 'dedup_index.npz'))
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(INDEX_STATE_DIR, 'lexical_index.jsonl'))
+CORPUS_VERSION_PATH = os.path.join(INDEX_STATE_DIR, 'corpus_version')  # Bumped by every ingestion path
+INGEST_JOBS_DIR = os.path.join(INDEX_STATE_DIR, 'jobs')  # Job progress, readable by every worker
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(__file__), 'embedding_cache'))
+RAG_NAMESPACE = check_namespace(os.getenv("RAG_NAMESPACE", ""))  # Namespace used when a request names none
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 ALLOWED_EXTENSIONS = {'docx', 'doc', 'pdf'}
 TOP_K = 7
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")  # BM25 + vector with RRF
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")  # Cross-encoder reranking
+RERANK_MODEL = os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # Candidates scored; best TOP_K are kept
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))  # Fall back to retrieval order beyond this
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_CONTEXT_TOKENS)))  # Prompt context cap
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx (int8 quantized)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Chunks per forward pass
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))  # Upsert requests in flight
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", str(DEFAULT_BATCH_BYTES)))  # Serialized size per request
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "5"))  # Retries of throttled / failed upserts
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))  # Persistent chunk vectors; 0 disables
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))  # Concurrent queries per forward pass; 1 disables
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))  # Wait for more queries after the first
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # Cached query embeddings
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # Seconds
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # Min cosine for a cache hit
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))  # Cached answers
+ANSWER_CACHE_MAX_MB = float(os.getenv("ANSWER_CACHE_MAX_MB", "32"))  # Memory cap
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Seconds; 0 keeps answers until the index changes
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))  # Concurrent background ingestion jobs
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))  # Processes parsing/chunking uploads
+UPLOAD_SPOOL_MAX_MB = float(os.getenv("UPLOAD_SPOOL_MAX_MB", "8"))  # Larger uploads spill to disk
+INGEST_DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.9"))  # Shingle Jaccard; 0 disables
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "64"))  # Queries per /chat/batch request
+BATCH_RETRIEVE_CONCURRENCY = int(os.getenv("BATCH_RETRIEVE_CONCURRENCY", "8"))  # Concurrent retrievals per batch
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))  # Gemini calls in flight (all batches)
 
 # Create upload folder if not exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -41,87 +99,494 @@
 pc_client = None
 index = None
 embeddings = None
+query_batcher = None
+document_cache = None
 gemini_model = None
+query_cache = QueryEmbeddingCache(max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_SIZE,
+    max_bytes=int(ANSWER_CACHE_MAX_MB * 1024 * 1024),
+    ttl=ANSWER_CACHE_TTL or None,
+    stamp=CorpusStamp(CORPUS_VERSION_PATH)
+)
+ingestion_jobs = JobQueue(max_workers=INGEST_WORKERS, state_dir=INGEST_JOBS_DIR)
+parse_pool = None
+ingest_manifest = IngestManifest(INGEST_MANIFEST_PATH)
+CHUNK_PARAMS = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+dedup_index = SignatureIndex(DEDUP_INDEX_PATH, threshold=INGEST_DEDUP_THRESHOLD or 0.9)
+lexical_index = BM25Index(LEXICAL_INDEX_PATH)
+dedup_indexes = {"": dedup_index}  # Per namespace; "" is the unnamed default namespace
+lexical_indexes = {"": lexical_index}
+_partitions_lock = threading.Lock()
+readiness = {'ready': False, 'error': None, 'warmup_ms': None, 'ready_since': None}
+_init_lock = threading.Lock()
+embedding_threads = None  # Per-worker inference threads (set in after_fork)
+reranker = CrossEncoderReranker(RERANK_MODEL, budget_ms=RERANK_BUDGET_MS) if RERANK_ENABLED else None
+batch_llm_slots = threading.BoundedSemaphore(max(1, BATCH_LLM_CONCURRENCY))
 
-def sanitize_text(text: str) -> str:
-    """Sanitize text to remove problematic characters"""
-    if not text:
-        return ""
-    # Remove non-ASCII characters
-    text = text.encode('ascii', 'ignore').decode('ascii')
-    # Remove control characters except newlines
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    return text.strip()
-
-def init_clients():
-    """Initialize Pinecone, Embeddings, and Gemini clients"""
-    global pc_client, index, embeddings, gemini_model
+# Prometheus metrics (see /metrics)
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram("rag_stage_seconds", "Time spent in each pipeline stage", ["pipeline", "stage"])
+ingest_chunks_total = metrics.counter("rag_ingest_chunks_total", "Chunks seen by ingestion, by outcome", ["state"])
+requests_total = metrics.counter("rag_requests_total", "Requests by endpoint and outcome", ["endpoint", "status"])
+
+def _cache_events():
+    """Hit/miss counters of every cache, read at scrape time"""
+    events = {}
+    caches = [("query_embedding", query_cache.stats()), ("answer", answer_cache.stats())]
+    if document_cache is not None:
+        caches.append(("document_embedding", document_cache.stats()))
+    for name, stats in caches:
+        events[(name, "hit")] = stats["hits"]
+        events[(name, "miss")] = stats["misses"]
+    return events
+
+metrics.callback("rag_cache_events_total", "Cache lookups by cache and result", "counter", ["cache", "result"], _cache_events)
+
+def _rerank_events():
+    """Reranker calls and fallbacks to retrieval order, read at scrape time"""
+    if reranker is None:
+        return {}
+    stats = reranker.stats()
+    events = {("reranked",): stats["calls"] - stats["fallbacks"]}
+    for reason, count in stats["fallbacks_by_reason"].items():
+        events[(f"fallback_{reason}",)] = count
+    return events
+
+metrics.callback("rag_rerank_calls_total", "Rerank calls by outcome (fallbacks keep retrieval order)", "counter", ["outcome"], _rerank_events)
+
+def get_dedup_index(namespace):
+    """Near-duplicate index of one namespace (copies in other namespaces do not count)"""
+    with _partitions_lock:
+        if namespace not in dedup_indexes:
+            dedup_indexes[namespace] = SignatureIndex(
+                partition_path(DEDUP_INDEX_PATH, namespace), threshold=INGEST_DEDUP_THRESHOLD or 0.9
+            )
+        return dedup_indexes[namespace]
+
+def get_lexical_index(namespace):
+    """BM25 index of one namespace"""
+    with _partitions_lock:
+        if namespace not in lexical_indexes:
+            lexical_indexes[namespace] = BM25Index(partition_path(LEXICAL_INDEX_PATH, namespace))
+        return lexical_indexes[namespace]
+
+def parse_scope(data):
+    """
+    (namespace, metadata filter, answer cache scope) of a chat request.
+    A missing or null namespace means RAG_NAMESPACE; raises ValueError if invalid.
+    """
+    namespace = data.get('namespace')
+    namespace = RAG_NAMESPACE if namespace is None else check_namespace(namespace)
+    metadata_filter = check_filter(data.get('filter'))
+    scope = json.dumps([namespace, metadata_filter], sort_keys=True) if namespace or metadata_filter else ""
+    return namespace, metadata_filter, scope
+
+def embed_and_upsert(records, batch_size=EMBED_BATCH_SIZE, namespace=RAG_NAMESPACE):
+    """
+    Embed records in batches and upsert them to the vector store.
+    Upserts run on background threads (UPSERT_CONCURRENCY requests in
+    flight, batched by serialized size, retried with backoff) while the
+    next batch is being embedded, so the network and the model overlap.
+    Returns (number of vectors upserted, elapsed seconds, ids that failed).
+    """
+    start = time.perf_counter()
     
-    if pc_client is not None:
+    with Upserter(
+        lambda vectors: _upsert_batch(vectors, namespace),
+        concurrency=UPSERT_CONCURRENCY,
+        max_bytes=UPSERT_MAX_BYTES,
+        max_retries=UPSERT_MAX_RETRIES
+    ) as upserter:
+        for i in range(0, len(records), batch_size):
+            batch = records[i:i + batch_size]
+            with stage_seconds.time(pipeline="ingest", stage="embed_batch"):
+                batch_vectors = embeddings.embed_documents([r["text"] for r in batch])
+            ingest_chunks_total.inc(len(batch), state="embedded")
+            
+            upserter.submit([
+                {"id": r["id"], "values": vec, "metadata": r["metadata"]}
+                for r, vec in zip(batch, batch_vectors)
+            ])
+    
+    result = upserter.close()
+    if result.retries:
+        print(f"🔁 Retried {result.retries} upsert requests")
+    ingest_chunks_total.inc(len(result.failed_ids), state="failed")
+    return result.upserted, time.perf_counter() - start, result.failed_ids
+
+def _upsert_batch(vectors, namespace=RAG_NAMESPACE):
+    """Upsert one batch (raises on failure, for the Upserter to retry)"""
+    with stage_seconds.time(pipeline="ingest", stage="upsert_batch"):
+        index.upsert(vectors=vectors, namespace=namespace)
+    ingest_chunks_total.inc(len(vectors), state="upserted")
+    return len(vectors)
+
+def init_clients(warm=True):
+    """
+    Initialize vector store, Embeddings, and Gemini clients, then warm them up.
+    Thread-safe: concurrent first requests wait for one initialization.
+    Safe to call again after a failure: clients that already loaded are kept.
+    warm=False only loads the clients (used before forking workers, see wsgi.py).
+    """
+    if readiness['ready']:
         return  # Already initialized
     
+    with _init_lock:
+        if not readiness['ready']:
+            _init_clients(warm)
+
+def _init_clients(warm):
+    global pc_client, index, embeddings, query_batcher, document_cache, gemini_model
+    
     try:
         print("🔧 Initializing RAG clients...")
         
-        # Initialize Pinecone
-        pc_client = Pinecone(api_key=PINECONE_API_KEY)
-        
-        # Check/Create index
-        try:
-            index = pc_client.Index(PINECONE_INDEX_NAME)
-            print(f"✅ Connected to Pinecone index: {PINECONE_INDEX_NAME}")
-        except Exception as e:
-            print(f"⚠️ Index not found, creating: {PINECONE_INDEX_NAME}")
-            pc_client.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=384,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud='aws',
-                    region='us-east-1'
+        if index is None and VECTOR_STORE == "pinecone":
+            # Initialize Pinecone
+            pc_client = Pinecone(api_key=PINECONE_API_KEY)
+            
+            # Check/Create index
+            try:
+                index = pc_client.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
+                print(f"✅ Connected to Pinecone index: {PINECONE_INDEX_NAME}")
+            except Exception as e:
+                print(f"⚠️ Index not found, creating: {PINECONE_INDEX_NAME}")
+                pc_client.create_index(
+                    name=PINECONE_INDEX_NAME,
+                    dimension=EMBEDDING_DIM,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud='aws',
+                        region='us-east-1'
+                    )
                 )
-            )
-            import time
-            time.sleep(3)
-            index = pc_client.Index(PINECONE_INDEX_NAME)
-            print(f"✅ Created Pinecone index: {PINECONE_INDEX_NAME}")
-        
-        # Initialize embeddings model
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True}
-        )
-        print("✅ Loaded embedding model")
+                time.sleep(3)
+                index = pc_client.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
+                print(f"✅ Created Pinecone index: {PINECONE_INDEX_NAME}")
+        elif index is None:
+            # Local in-process vector store
+            index = open_vector_store(VECTOR_STORE, VECTOR_STORE_PATH, dimension=EMBEDDING_DIM)
+            print(f"✅ Opened local '{VECTOR_STORE}' vector store: {VECTOR_STORE_PATH}")
         
-        # Initialize Gemini
-        genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        print("✅ Initialized Gemini model")
+        if embeddings is None:
+            # Initialize embeddings model (query embeddings are served from an LRU cache;
+            # misses from concurrent requests are embedded together in micro-batches;
+            # chunk embeddings are reused from the persistent embedding cache)
+            model = create_embeddings(EMBEDDING_BACKEND, ONNX_MODEL_DIR, embedding_threads)
+            if EMBED_MAX_BATCH > 1:
+                model = query_batcher = MicroBatchingEmbeddings(model, EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS)
+            if EMBEDDING_CACHE_MAX_MB > 0:
+                model = document_cache = DiskCachedEmbeddings(model, PersistentEmbeddingCache(
+                    EMBEDDING_CACHE_PATH,
+                    embedding_model_id(EMBEDDING_BACKEND),
+                    dimension=EMBEDDING_DIM,
+                    max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+                ))
+            embeddings = CachedEmbeddings(model, query_cache)
+            print(f"✅ Loaded embedding model ({EMBEDDING_BACKEND})")
+        
+        if reranker is not None:
+            reranker.load()
+            print(f"✅ Loaded reranker: {RERANK_MODEL}")
+        
+        if gemini_model is None:
+            # Initialize Gemini
+            genai.configure(api_key=GEMINI_API_KEY)
+            gemini_model = genai.GenerativeModel("gemini-2.5-flash-lite")
+            print("✅ Initialized Gemini model")
+        
+        if warm:
+            warm_up()
         
     except Exception as e:
+        readiness['error'] = str(e)
         print(f"❌ Error initializing clients: {str(e)}")
         raise
 
+WARMUP_TEXTS = [
+    "How much of my monthly stipend should I save for an emergency fund?",
+    "Section 80C allows deductions for ELSS, PPF and life insurance premiums. " * 6,
+] * 4
+
+def warm_up():
+    """
+    Run dummy batches through the models and check the vector store, so
+    the first real request does not pay for lazy initialization. Marks
+    the service ready (see /ready) when everything succeeded.
+    """
+    start = time.perf_counter()
+    
+    # Document batch and a single query, bypassing the query and embedding caches
+    model = document_cache.embeddings if document_cache is not None else embeddings.embeddings
+    model.embed_documents(WARMUP_TEXTS)
+    model.embed_query(WARMUP_TEXTS[0])
+    
+    if reranker is not None:
+        reranker.model.predict([(WARMUP_TEXTS[0], text) for text in WARMUP_TEXTS])
+    
+    # Verify the vector store handle answers
+    stats = index.describe_index_stats()
+    dimension = stats.get('dimension') or EMBEDDING_DIM
+    if dimension != EMBEDDING_DIM:
+        raise RuntimeError(f"Vector store dimension {dimension} does not match embedding dimension {EMBEDDING_DIM}")
+    
+    readiness.update(
+        ready=True,
+        error=None,
+        warmup_ms=round((time.perf_counter() - start) * 1000, 1),
+        ready_since=datetime.now().isoformat()
+    )
+    print(f"🔥 Warmed up in {readiness['warmup_ms']:.0f} ms")
+
+def after_fork(torch_threads=None):
+    """
+    Prepare a forked server worker (called from gunicorn's post_fork hook).
+    Model weights loaded before the fork are shared copy-on-write; network
+    clients are not fork-safe, so the Pinecone handle is reopened here, and
+    the warm-up runs in the worker so no torch thread pool crosses a fork.
+    """
+    global pc_client, index, embeddings, embedding_threads
+    
+    embedding_threads = torch_threads
+    if EMBEDDING_BACKEND == "onnx":
+        # onnxruntime sessions are not fork-safe; the int8 model is small, so reload it
+        embeddings = None
+    elif torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+    
+    if pc_client is not None:
+        pc_client = Pinecone(api_key=PINECONE_API_KEY)
+        index = pc_client.Index(PINECONE_INDEX_NAME, pool_threads=UPSERT_CONCURRENCY)
+    
+    try:
+        init_clients()
+    except Exception as e:
+        print(f"⚠️ Worker {os.getpid()} not ready, will retry on first request: {e}")
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    """Count every request and time it (streamed bodies: until the headers are sent)"""
+    endpoint = request.endpoint or 'unknown'
+    if endpoint != 'get_metrics':
+        requests_total.inc(endpoint=endpoint, status=response.status_code)
+        started = getattr(g, 'request_started', None)
+        if started is not None:
+            stage_seconds.observe(time.perf_counter() - started, pipeline="http", stage=endpoint)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics: per-stage latency histograms, ingestion and cache counters"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness; see /ready for readiness)"""
     return jsonify({
         'status': 'OK',
         'message': 'RAG Service is running',
+        'ready': readiness['ready'],
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/ready', methods=['GET'])
+def ready_check():
+    """Readiness probe: 200 once models are loaded and warmed up, 503 before"""
+    return jsonify({
+        'status': 'READY' if readiness['ready'] else 'STARTING',
+        **readiness
+    }), 200 if readiness['ready'] else 503
+
+def get_parse_pool():
+    """
+    Process pool used to parse and chunk uploads (created on first use).
+    Workers come from a forkserver (spawn where unavailable): forking this
+    multithreaded process (torch/ONNX thread pools, the micro-batcher) can
+    deadlock the child.
+    """
+    global parse_pool
+    with _init_lock:
+        if parse_pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["parsing"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+    return parse_pool
+
+def reset_parse_pool(pool):
+    """
+    Discard a broken parse pool (one of its workers died, e.g. OOM-killed
+    on a large PDF) so the next job gets a fresh one.
+    """
+    global parse_pool
+    with _init_lock:
+        if parse_pool is pool:
+            parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def ingest_chunks(texts, filename, digest, report, namespace=RAG_NAMESPACE):
+    """
+    Embed and upsert the parsed chunk texts of one file, incrementally
+    (see ingestion.ingest_texts). Everything (vectors, BM25 and dedup
+    indexes, manifest entry) is kept per namespace.
+    `report(**fields)` receives progress updates.
+    Returns (number of chunks upserted, elapsed seconds, ids that failed).
+    """
+    def upsert_records(records):
+        upserted, _, failed_ids = embed_and_upsert(records, namespace=namespace)
+        return upserted, failed_ids
+    
+    result = ingest_texts(
+        texts, filename, digest, CHUNK_PARAMS,
+        index=index,
+        manifest=ingest_manifest,
+        lexical_index=get_lexical_index(namespace),
+        upsert_records=upsert_records,
+        dedup_index=get_dedup_index(namespace) if INGEST_DEDUP_THRESHOLD > 0 else None,
+        namespace=namespace,
+        metadata={"uploaded_at": datetime.now().isoformat()},
+        report=report,
+        # The index changed (possibly partially): cached answers are stale
+        on_change=answer_cache.invalidate
+    )
+    ingest_chunks_total.inc(result.unchanged, state="unchanged")
+    ingest_chunks_total.inc(result.duplicates, state="duplicate")
+    ingest_chunks_total.inc(result.deleted, state="deleted")
+    print(f"🚀 Uploaded {result.upserted} new chunks from {filename} into namespace '{namespace}' "
+          f"({result.unchanged} unchanged, {result.duplicates} near-duplicates dropped, {result.deleted} removed)")
+    return result.upserted, result.elapsed, result.failed_ids
+
+def run_ingestion_job(job, saved_files, namespace=RAG_NAMESPACE):
+    """
+    Ingest every upload of a job into `namespace`, recording per-file progress.
+    Each upload is (source, filename): raw bytes for in-memory uploads, a
+    path for uploads spilled to disk (deleted once parsed), or None if
+    rejected.
+    Files whose content hash matches the manifest are skipped. Planning
+    (counting PDF pages), parsing and chunking of the rest (and page ranges
+    of large PDFs) is fanned out to the process pool up front; files are
+    then embedded in upload order as their parse results arrive.
+    """
+    pool = get_parse_pool()
+    parsing = []
+    for position, (source, filename) in enumerate(saved_files):
+        if source is None:
+            continue  # Rejected at upload time
+        
+        print(f"📄 Parsing document: {filename}")
+        job.update_file(position, stage="parsing")
+        try:
+            digest = source_digest(source)
+            if ingest_manifest.is_unchanged(namespaced_source(filename, namespace), digest, CHUNK_PARAMS):
+                futures = None
+            else:
+                futures = pool.submit(plan_parse_tasks, source, filename, PDF_PAGES_PER_TASK)
+        except Exception as e:
+            digest, futures = None, e
+        parsing.append([position, source, filename, digest, futures, time.perf_counter()])
+    
+    # Fan each file out into its parse tasks once its plan is ready
+    for entry in parsing:
+        if isinstance(entry[4], Future):
+            try:
+                entry[4] = [pool.submit(parse_task, task) for task in entry[4].result()]
+            except Exception as e:
+                entry[4] = e
+    
+    for position, source, filename, digest, futures, submitted in parsing:
+        def report(**fields):
+            job.update_file(position, **fields)
+        
+        try:
+            if isinstance(futures, Exception):
+                raise futures
+            if futures is None:
+                report(stage="unchanged", chunks=0, success=True)
+                print(f"⏭️ Skipping unchanged document: {filename}")
+                continue
+            
+            # Merge page-range results back in document order
+            texts = [text for future in futures for text in future.result()]
+            stage_seconds.observe(time.perf_counter() - submitted, pipeline="ingest", stage="parse")
+            ingest_chunks_total.inc(len(texts), state="parsed")
+            
+            with stage_seconds.time(pipeline="ingest", stage="file"):
+                chunk_count, elapsed, failed_ids = ingest_chunks(texts, filename, digest, report, namespace)
+            chunks_per_sec = chunk_count / elapsed if elapsed > 0 else 0.0
+            report(
+                stage="done",
+                chunks=chunk_count,
+                elapsed=round(elapsed, 3),
+                chunks_per_sec=round(chunks_per_sec, 2),
+                failed_chunks=len(failed_ids),
+                failed_ids=failed_ids,
+                success=not failed_ids
+            )
+            if failed_ids:
+                report(error=f"{len(failed_ids)} chunks failed to upload; upload the file again to retry them")
+                print(f"⚠️ Ingested {filename} with {len(failed_ids)} failed chunks")
+            else:
+                print(f"✅ Successfully ingested {filename} ({chunks_per_sec:.1f} chunks/sec)")
+        
+        except BrokenProcessPool:
+            # Every file still parsing in this pool fails; later jobs use a new pool
+            reset_parse_pool(pool)
+            report(stage="failed", error="A parse worker crashed (out of memory?)", success=False)
+            print(f"❌ Parse worker crashed while processing {filename}")
+        
+        except Exception as e:
+            report(stage="failed", error=str(e), success=False)
+            print(f"❌ Error processing {filename}: {str(e)}")
+        
+        finally:
+            # Cleanup spilled file once every parse task has finished with it
+            if isinstance(futures, list):
+                wait(futures)
+            if isinstance(source, str) and os.path.exists(source):
+                os.unlink(source)
+
+def spool_upload(file):
+    """
+    Return the upload's bytes, or a path on disk if it exceeds the spool
+    limit. Bytes are pickled into each parse task, so larger files are
+    written once under UPLOAD_FOLDER and the workers read them from there.
+    """
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    
+    if size <= UPLOAD_SPOOL_MAX_MB * 1024 * 1024:
+        return stream.read()
+    
+    filepath = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{secure_filename(file.filename)}")
+    file.save(filepath)
+    return filepath
+
 @app.route('/upload-documents', methods=['POST'])
 def upload_documents():
-    """Upload and ingest DOCX documents into Pinecone"""
+    """
+    Upload DOCX/PDF documents for ingestion into the vector store.
+    Returns 202 with a job id immediately; poll /jobs/<job_id> for progress.
+    Pass ?sync=true to ingest inside the request (legacy behaviour).
+    A `namespace` form field (or query arg) selects the target namespace.
+    """
     try:
         # Initialize clients if not already done
-        if pc_client is None:
+        if not readiness['ready']:
             init_clients()
         
         # Check if files are present
@@ -132,94 +597,52 @@ def upload_documents():
         if not files or files[0].filename == '':
             return jsonify({'success': False, 'message': 'No files selected'}), 400
         
-        results = []
-        total_chunks = 0
+        try:
+            namespace = request.form.get('namespace', request.args.get('namespace'))
+            namespace = RAG_NAMESPACE if namespace is None else check_namespace(namespace)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
+        # Capture uploads before the request ends: small files stay in memory,
+        # only uploads above UPLOAD_SPOOL_MAX_MB are spilled to disk
+        saved_files = []
         for file in files:
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
-                file.save(filepath)
-                
-                try:
-                    # Load document based on file type
-                    print(f"📄 Loading document: {filename}")
-                    if filename.lower().endswith('.pdf'):
-                        loader = PyPDFLoader(filepath)
-                    else:
-                        loader = Docx2txtLoader(filepath)
-                    docs = loader.load()
-                    
-                    # Split into chunks
-                    print("✂️ Splitting into chunks...")
-                    splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=500,
-                        chunk_overlap=100
-                    )
-                    chunks = splitter.split_documents(docs)
-                    
-                    # Embed and upload to Pinecone
-                    print(f"🚀 Uploading {len(chunks)} chunks to Pinecone...")
-                    vectors_to_upsert = []
-                    
-                    for doc in chunks:
-                        text = sanitize_text(doc.page_content)
-                        if not text:
-                            continue
-                        
-                        embedding = embeddings.embed_query(text)
-                        point_id = str(uuid.uuid4())
-                        
-                        vectors_to_upsert.append({
-                            "id": point_id,
-                            "values": embedding,
-                            "metadata": {
-                                "text": text,
-                                "source": filename,
-                                "uploaded_at": datetime.now().isoformat()
-                            }
-                        })
-                    
-                    # Upsert in batches
-                    batch_size = 100
-                    for i in range(0, len(vectors_to_upsert), batch_size):
-                        batch = vectors_to_upsert[i:i + batch_size]
-                        index.upsert(vectors=batch)
-                    
-                    total_chunks += len(vectors_to_upsert)
-                    results.append({
-                        'filename': filename,
-                        'chunks': len(vectors_to_upsert),
-                        'success': True
-                    })
-                    
-                    print(f"✅ Successfully ingested {filename}")
-                    
-                except Exception as e:
-                    results.append({
-                        'filename': filename,
-                        'error': str(e),
-                        'success': False
-                    })
-                    print(f"❌ Error processing {filename}: {str(e)}")
-                
-                finally:
-                    # Cleanup file
-                    if os.path.exists(filepath):
-                        os.unlink(filepath)
+                saved_files.append((spool_upload(file), secure_filename(file.filename)))
             else:
-                results.append({
-                    'filename': file.filename,
-                    'error': 'Invalid file type',
-                    'success': False
-                })
+                saved_files.append((None, file.filename))
+        
+        job = IngestionJob([filename for _, filename in saved_files])
+        for position, (source, _) in enumerate(saved_files):
+            if source is None:
+                job.update_file(position, stage="failed", error="Invalid file type", success=False)
+        
+        if request.args.get('sync', '').lower() in ('1', 'true', 'yes'):
+            JobQueue.run(job, lambda j: run_ingestion_job(j, saved_files, namespace))
+            result = job.to_dict()
+            return jsonify({
+                'success': result['status'] == JOB_COMPLETED,
+                'status': result['status'],
+                'message': f'Processed {len(files)} files, ingested {result["total_chunks"]} chunks',
+                'results': result['files'],
+                'total_chunks': result['total_chunks'],
+                'duplicate_chunks': result['duplicate_chunks'],
+                'failed_chunks': result['failed_chunks'],
+                'namespace': namespace,
+                'chunks_per_sec': result['chunks_per_sec'],
+                'embed_batch_size': EMBED_BATCH_SIZE
+            })
+        
+        ingestion_jobs.submit(job, lambda j: run_ingestion_job(j, saved_files, namespace))
+        print(f"📥 Queued ingestion job {job.id} ({len(saved_files)} files, namespace '{namespace}')")
         
         return jsonify({
             'success': True,
-            'message': f'Processed {len(files)} files, ingested {total_chunks} chunks',
-            'results': results,
-            'total_chunks': total_chunks
-        })
+            'message': f'Accepted {len(files)} files for ingestion',
+            'job_id': job.id,
+            'namespace': namespace,
+            'status_url': f'/jobs/{job.id}'
+        }), 202
         
     except Exception as e:
         print(f"❌ Upload error: {str(e)}")
@@ -228,12 +651,103 @@ def upload_documents():
             'message': str(e)
         }), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report progress of an ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, **job})
+
+NO_CONTEXT_ANSWER = "I don't have any relevant information to answer your question. Please ensure financial advisory documents are uploaded."
+
+def retrieve_context(query, query_vec, namespace=RAG_NAMESPACE, metadata_filter=None):
+    """
+    Query the vector store and return (context chunks, unique sources, context tokens).
+    Only `namespace` is searched, and only chunks matching the Pinecone-style
+    `metadata_filter` (e.g. {"source": "statement.pdf"}) are considered.
+    With HYBRID_SEARCH, BM25 matches are fused with the vector matches by
+    reciprocal rank fusion so exact terms (e.g. "80C") are not missed.
+    With RERANK_ENABLED, RERANK_CANDIDATES matches are reranked by a
+    cross-encoder and the best TOP_K are kept.
+    Chunks are packed into CONTEXT_TOKEN_BUDGET tokens in relevance order.
+    """
+    top_k = max(TOP_K, RERANK_CANDIDATES) if reranker is not None else TOP_K
+    with stage_seconds.time(pipeline="chat", stage="vector_query"):
+        results = index.query(
+            vector=query_vec,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespace,
+            filter=metadata_filter
+        )
+    matches = results.get("matches", [])
+    if HYBRID_SEARCH:
+        with stage_seconds.time(pipeline="chat", stage="lexical_search"):
+            lexical_matches = get_lexical_index(namespace).search(query, top_k, filter=metadata_filter)
+        matches = reciprocal_rank_fusion([matches, lexical_matches], top_k=top_k)
+    if reranker is not None:
+        with stage_seconds.time(pipeline="chat", stage="rerank"):
+            matches = reranker.rerank(query, [m for m in matches if m.get("metadata")], TOP_K)
+    
+    matches = [m for m in matches if m.get("metadata")]
+    with stage_seconds.time(pipeline="chat", stage="pack_context"):
+        packed = pack_context([m["metadata"]["text"] for m in matches], CONTEXT_TOKEN_BUDGET)
+    
+    sources = []
+    for match in matches[:len(packed.chunks)]:
+        source = match["metadata"].get("source", "Unknown")
+        if source not in sources:
+            sources.append(source)
+    if packed.trimmed:
+        print(f"✂️ Context packed to {packed.tokens}/{CONTEXT_TOKEN_BUDGET} tokens ({len(packed.chunks)}/{len(matches)} chunks)")
+    return packed.chunks, sources, packed.tokens
+
+def build_prompt(query, context_chunks):
+    """Build the Gemini prompt from the retrieved context"""
+    context = "\n\n".join(context_chunks)
+    
+    return f"""You are a helpful financial advisor AI assistant for F-Buddy, a student finance management app.
+
+CONTEXT (from financial advisory documents):
+{context}
+
+USER QUESTION:
+{query}
+
+Instructions:
+- Provide a clear, concise, and helpful answer based ONLY on the context above
+- If the context doesn't contain relevant information, politely say so
+- For financial advice, always remind users to consult with professionals for major decisions
+- Be friendly and encouraging, especially to students
+- Keep your response under 200 words
+
+Answer:"""
+
+def stream_text(response):
+    """Yield text from a streaming Gemini response, skipping empty/blocked chunks"""
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/chat', methods=['POST'])
 def chat():
-    """Handle chat queries using RAG pipeline"""
+    """
+    Handle chat queries using RAG pipeline.
+    Optional `namespace` and Pinecone-style metadata `filter` (e.g.
+    {"source": "statement.pdf"}) restrict which chunks are searched.
+    """
     try:
         # Initialize clients if not already done
-        if pc_client is None:
+        if not readiness['ready']:
             init_clients()
         
         data = request.get_json()
@@ -241,81 +755,258 @@ def chat():
             return jsonify({'success': False, 'message': 'Query is required'}), 400
         
         query = data['query']
+        try:
+            namespace, metadata_filter, scope = parse_scope(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Retrieve relevant chunks from Pinecone
+        # Retrieve relevant chunks from the vector store
         print(f"🔍 Searching for: {query}")
-        query_vec = embeddings.embed_query(query)
+        cache_version = answer_cache.version
+        with stage_seconds.time(pipeline="chat", stage="embed_query"):
+            query_vec = embeddings.embed_query(query)
         
-        results = index.query(
-            vector=query_vec,
-            top_k=TOP_K,
-            include_metadata=True
-        )
+        # Serve near-identical questions from the semantic answer cache
+        with stage_seconds.time(pipeline="chat", stage="answer_cache"):
+            cached = answer_cache.get(query_vec, scope)
+        if cached is not None:
+            print(f"⚡ Answer cache hit (similarity {cached['similarity']:.3f})")
+            return jsonify({'success': True, **cached, 'cached': True})
         
-        # Extract context
-        context_chunks = []
-        sources = []
-        for match in results.get("matches", []):
-            if match.get("metadata"):
-                context_chunks.append(match["metadata"]["text"])
-                source = match["metadata"].get("source", "Unknown")
-                if source not in sources:
-                    sources.append(source)
+        context_chunks, sources, context_tokens = retrieve_context(query, query_vec, namespace, metadata_filter)
         
         if not context_chunks:
             return jsonify({
                 'success': True,
-                'answer': "I don't have any relevant information to answer your question. Please ensure financial advisory documents are uploaded.",
+                'answer': NO_CONTEXT_ANSWER,
                 'sources': []
             })
         
         # Generate answer using Gemini
-        context = "\n\n".join(context_chunks)
-        
-        prompt = f"""You are a helpful financial advisor AI assistant for F-Buddy, a student finance management app.
-
-CONTEXT (from financial advisory documents):
-{context}
-
-USER QUESTION:
-{query}
-
-Instructions:
-- Provide a clear, concise, and helpful answer based ONLY on the context above
-- If the context doesn't contain relevant information, politely say so
-- For financial advice, always remind users to consult with professionals for major decisions
-- Be friendly and encouraging, especially to students
-- Keep your response under 200 words
-
-Answer:"""
+        with stage_seconds.time(pipeline="chat", stage="build_prompt"):
+            prompt = build_prompt(query, context_chunks)
 
         print("🤖 Generating answer with Gemini...")
         # Re-configure API key before each request (ensures it's set)
         genai.configure(api_key=GEMINI_API_KEY)
-        response = gemini_model.generate_content(prompt)
-        answer = response.text
+        with stage_seconds.time(pipeline="chat", stage="generate"):
+            response = gemini_model.generate_content(prompt)
+            answer = response.text
         
         print(f"✅ Generated answer ({len(answer)} chars)")
         
+        payload = {
+            'answer': answer,
+            'sources': sources,
+            'context_used': len(context_chunks),
+            'context_tokens': context_tokens
+        }
+        answer_cache.put(query_vec, payload, cache_version, scope)
+        
+        return jsonify({'success': True, **payload, 'cached': False})
+        
+    except Exception as e:
+        print(f"❌ Chat error: {str(e)}")
         return jsonify({
-            'success': True,
+            'success': False,
+            'message': str(e)
+        }), 500
+
+def _ms_since(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def answer_batch_query(query, query_vec, cache_version, namespace=RAG_NAMESPACE, metadata_filter=None, scope=""):
+    """Answer one query of a /chat/batch request; returns its result with per-stage timings (ms)"""
+    timings = {}
+    try:
+        start = time.perf_counter()
+        cached = answer_cache.get(query_vec, scope)
+        timings['answer_cache'] = _ms_since(start)
+        if cached is not None:
+            return {'query': query, 'success': True, **cached, 'cached': True, 'timings': timings}
+        
+        start = time.perf_counter()
+        context_chunks, sources, context_tokens = retrieve_context(query, query_vec, namespace, metadata_filter)
+        timings['retrieve'] = _ms_since(start)
+        if not context_chunks:
+            return {'query': query, 'success': True, 'answer': NO_CONTEXT_ANSWER, 'sources': [],
+                    'cached': False, 'timings': timings}
+        
+        prompt = build_prompt(query, context_chunks)
+        start = time.perf_counter()
+        with batch_llm_slots:
+            timings['llm_wait'] = _ms_since(start)
+            start = time.perf_counter()
+            with stage_seconds.time(pipeline="chat", stage="generate"):
+                answer = gemini_model.generate_content(prompt).text
+            timings['generate'] = _ms_since(start)
+        
+        payload = {
             'answer': answer,
             'sources': sources,
-            'context_used': len(context_chunks)
+            'context_used': len(context_chunks),
+            'context_tokens': context_tokens
+        }
+        answer_cache.put(query_vec, payload, cache_version, scope)
+        return {'query': query, 'success': True, **payload, 'cached': False, 'timings': timings}
+    
+    except Exception as e:
+        print(f"❌ Batch query error: {str(e)}")
+        return {'query': query, 'success': False, 'message': str(e), 'timings': timings}
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answer a list of queries in one request (evaluation runs, suggested-question preloads).
+    All queries are embedded in one forward pass, retrieval runs
+    BATCH_RETRIEVE_CONCURRENCY queries at a time and at most
+    BATCH_LLM_CONCURRENCY Gemini calls are in flight across all batches.
+    Results (answer, sources, timings in ms) come back in request order;
+    a failed query does not fail the others. `namespace` and `filter`
+    apply to every query, as in /chat.
+    """
+    try:
+        if not readiness['ready']:
+            init_clients()
+        
+        data = request.get_json()
+        queries = data.get('queries') if isinstance(data, dict) else None
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({'success': False, 'message': 'queries must be a non-empty list of strings'}), 400
+        if len(queries) > BATCH_MAX_QUERIES:
+            return jsonify({'success': False, 'message': f'At most {BATCH_MAX_QUERIES} queries per batch'}), 400
+        try:
+            namespace, metadata_filter, scope = parse_scope(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        print(f"🔍 Batch of {len(queries)} queries")
+        started = time.perf_counter()
+        cache_version = answer_cache.version
+        with stage_seconds.time(pipeline="chat", stage="embed_queries"):
+            query_vecs = embeddings.embed_queries(queries)
+        embed_ms = _ms_since(started)
+        
+        genai.configure(api_key=GEMINI_API_KEY)
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_RETRIEVE_CONCURRENCY, len(queries)))) as pool:
+            results = list(pool.map(
+                lambda item: answer_batch_query(item[0], item[1], cache_version, namespace, metadata_filter, scope),
+                zip(queries, query_vecs)
+            ))
+        
+        failed = sum(1 for r in results if not r['success'])
+        print(f"✅ Answered batch of {len(queries)} queries ({failed} failed)")
+        return jsonify({
+            'success': True,
+            'results': results,
+            'failed': failed,
+            'timings': {'embed': embed_ms, 'total': _ms_since(started)}
         })
         
     except Exception as e:
-        print(f"❌ Chat error: {str(e)}")
+        print(f"❌ Chat batch error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /chat (Server-Sent Events).
+    Emits a 'sources' event as soon as retrieval finishes, then one 'token'
+    event per Gemini chunk, then 'done' (or 'error').
+    """
+    try:
+        if not readiness['ready']:
+            init_clients()
+        
+        data = request.get_json()
+        if not data or 'query' not in data:
+            return jsonify({'success': False, 'message': 'Query is required'}), 400
+        
+        query = data['query']
+        try:
+            namespace, metadata_filter, scope = parse_scope(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        print(f"🔍 Streaming search for: {query}")
+        cache_version = answer_cache.version
+        with stage_seconds.time(pipeline="chat", stage="embed_query"):
+            query_vec = embeddings.embed_query(query)
+        with stage_seconds.time(pipeline="chat", stage="answer_cache"):
+            cached = answer_cache.get(query_vec, scope)
+        if cached is None:
+            context_chunks, sources, context_tokens = retrieve_context(query, query_vec, namespace, metadata_filter)
+        else:
+            context_chunks, sources, context_tokens = [], cached['sources'], cached.get('context_tokens', 0)
+        
+    except Exception as e:
+        print(f"❌ Chat stream error: {str(e)}")
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
+    
+    def generate():
+        if cached is not None:
+            yield sse_event('sources', {
+                'sources': sources,
+                'context_used': cached.get('context_used', 0),
+                'context_tokens': context_tokens
+            })
+            yield sse_event('token', {'text': cached['answer']})
+            yield sse_event('done', {'cached': True})
+            return
+        
+        yield sse_event('sources', {
+            'sources': sources,
+            'context_used': len(context_chunks),
+            'context_tokens': context_tokens
+        })
+        
+        if not context_chunks:
+            yield sse_event('token', {'text': NO_CONTEXT_ANSWER})
+            yield sse_event('done', {'cached': False})
+            return
+        
+        try:
+            genai.configure(api_key=GEMINI_API_KEY)
+            start = time.perf_counter()
+            response = gemini_model.generate_content(build_prompt(query, context_chunks), stream=True)
+            parts = []
+            for text in stream_text(response):
+                if not parts:
+                    stage_seconds.observe(time.perf_counter() - start, pipeline="chat", stage="first_token")
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+            stage_seconds.observe(time.perf_counter() - start, pipeline="chat", stage="generate_stream")
+            
+            answer = "".join(parts)
+            print(f"✅ Streamed answer ({len(answer)} chars)")
+            answer_cache.put(query_vec, {
+                'answer': answer,
+                'sources': sources,
+                'context_used': len(context_chunks),
+                'context_tokens': context_tokens
+            }, cache_version, scope)
+            yield sse_event('done', {'cached': False})
+        except Exception as e:
+            print(f"❌ Chat stream error: {str(e)}")
+            yield sse_event('error', {'message': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get statistics about indexed documents"""
     try:
-        if pc_client is None:
+        if not readiness['ready']:
             init_clients()
         
         stats = index.describe_index_stats()
@@ -323,8 +1014,15 @@ def get_stats():
         return jsonify({
             'success': True,
             'total_vectors': stats.get('total_vector_count', 0),
-            'dimension': stats.get('dimension', 384),
-            'index_name': PINECONE_INDEX_NAME
+            'namespaces': namespace_counts(stats),
+            'dimension': stats.get('dimension', EMBEDDING_DIM),
+            'index_name': PINECONE_INDEX_NAME if VECTOR_STORE == "pinecone" else VECTOR_STORE_PATH,
+            'backend': VECTOR_STORE,
+            'query_cache': query_cache.stats(),
+            'query_batching': query_batcher.stats() if query_batcher is not None else None,
+            'embedding_cache': document_cache.stats() if document_cache is not None else None,
+            'answer_cache': answer_cache.stats(),
+            'reranker': reranker.stats() if reranker is not None else None
         })
         
     except Exception as e:
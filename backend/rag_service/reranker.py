@@ -0,0 +1,103 @@
+"""
+Optional cross-encoder reranking stage for RAG retrieval
+Scores every (query, chunk) pair with a small CPU cross-encoder in one
+batched call and keeps the best N, so fewer and better chunks reach Gemini.
+Reranking runs under a hard time budget: when it is exceeded (or the
+model is unavailable) the original retrieval order is used instead.
+Concurrent calls wait their turn within that budget.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def match_text(match: Dict) -> str:
+    """Chunk text of a Pinecone-style match"""
+    return (match.get("metadata") or {}).get("text", "")
+
+
+class CrossEncoderReranker:
+    """
+    Batched cross-encoder reranker with a latency budget.
+    Runs on one background thread; a call waits for earlier ones to finish
+    scoring for up to its budget, and falls back if the wait plus its own
+    scoring would exceed it. Fallbacks are counted by reason (busy, timeout,
+    error).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, budget_ms: float = 300, max_length: int = 256):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.max_length = max_length
+        self.model = None
+        self.calls = 0
+        self.fallbacks = {"busy": 0, "timeout": 0, "error": 0}
+        self._stats_lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    def load(self):
+        """Load the cross-encoder (done lazily on first use otherwise)"""
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self.model
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        try:
+            return list(self.load().predict([(query, text) for text in texts], batch_size=len(texts)))
+        finally:
+            self._busy.release()
+
+    def _fallback(self, reason: str):
+        with self._stats_lock:
+            self.fallbacks[reason] += 1
+
+    def rerank(self, query: str, items: List, top_n: int, text_of: Callable[[object], str] = match_text,
+               budget_ms: Optional[float] = None) -> List:
+        """Return the top_n items by cross-encoder score, or the first top_n items on timeout/error"""
+        with self._stats_lock:
+            self.calls += 1
+        if len(items) <= 1:
+            return items[:top_n]
+
+        budget = (budget_ms if budget_ms is not None else self.budget_ms) / 1000.0
+        start = time.perf_counter()
+        # Queue behind calls still scoring; give up once the budget is spent waiting
+        if not self._busy.acquire(timeout=budget):
+            self._fallback("busy")
+            print(f"⏱️ Reranker busy for the whole {budget * 1000:.0f} ms budget, using retrieval order")
+            return items[:top_n]
+        try:
+            future = self._executor.submit(self._score, query, [text_of(item) for item in items])
+        except Exception:
+            self._busy.release()
+            raise
+        try:
+            scores = future.result(timeout=max(budget - (time.perf_counter() - start), 0.0))
+        except TimeoutError:
+            self._fallback("timeout")
+            print(f"⏱️ Rerank exceeded {budget * 1000:.0f} ms budget, using retrieval order")
+            return items[:top_n]
+        except Exception as e:
+            self._fallback("error")
+            print(f"⚠️ Rerank failed, using retrieval order: {str(e)}")
+            return items[:top_n]
+
+        order = sorted(range(len(items)), key=lambda i: scores[i], reverse=True)
+        print(f"🔀 Reranked {len(items)} chunks in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return [items[i] for i in order[:top_n]]
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "budget_ms": self.budget_ms,
+                "calls": self.calls,
+                "fallbacks": sum(self.fallbacks.values()),
+                "fallbacks_by_reason": dict(self.fallbacks),
+            }
@@ -6,9 +6,11 @@
 import os
 import requests
 import sys
+import time
 from pathlib import Path
 
 RAG_SERVICE_URL = "http://localhost:5002"
+JOB_POLL_INTERVAL = 2  # Seconds between /jobs/<id> polls
 
 def upload_documents(file_paths):
     """Upload documents to RAG service"""
@@ -48,27 +50,24 @@ def upload_documents(file_paths):
         response = requests.post(
             f"{RAG_SERVICE_URL}/upload-documents",
             files=files,
-            timeout=300  # 5 minutes timeout for large files
+            timeout=300  # 5 minutes to transfer large files (ingestion itself is polled)
         )
         
         # Close file handles
         for _, file_tuple in files:
             file_tuple[1].close()
         
-        if response.status_code == 200:
+        if response.status_code == 202:
+            # Ingestion runs in the background: poll the job until it finishes
+            job_id = response.json().get('job_id')
+            print(f"📥 Accepted as job {job_id}, waiting for ingestion...")
+            data = wait_for_job(job_id)
+            if data is None:
+                return False
+            return print_results(data.get('files', []), data)
+        elif response.status_code == 200:
             data = response.json()
-            print("\n✅ Upload successful!")
-            print(f"📊 Total chunks ingested: {data.get('total_chunks', 0)}")
-            
-            if 'results' in data:
-                print("\n📄 Results:")
-                for result in data['results']:
-                    if result.get('success'):
-                        print(f"  ✅ {result['filename']}: {result['chunks']} chunks")
-                    else:
-                        print(f"  ❌ {result['filename']}: {result.get('error', 'Unknown error')}")
-            
-            return True
+            return print_results(data.get('results', []), data)
         else:
             print(f"\n❌ Upload failed: {response.status_code}")
             print(response.text)
@@ -82,6 +81,58 @@ def upload_documents(file_paths):
         print(f"\n❌ Error: {str(e)}")
         return False
 
+def wait_for_job(job_id):
+    """Poll an ingestion job until it completes, printing stage changes"""
+    last_stages = None
+    while True:
+        try:
+            response = requests.get(f"{RAG_SERVICE_URL}/jobs/{job_id}", timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Could not poll job {job_id}: {str(e)}")
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        
+        if response.status_code != 200:
+            print(f"\n❌ Job lookup failed: {response.status_code}")
+            print(response.text)
+            return None
+        
+        data = response.json()
+        stages = [(f['filename'], f['stage'], f.get('chunks', 0)) for f in data.get('files', [])]
+        if stages != last_stages:
+            for filename, stage, chunks in stages:
+                print(f"  ⏳ {filename}: {stage} ({chunks} chunks)")
+            last_stages = stages
+        
+        if data.get('status') in ('completed', 'partial', 'failed'):
+            if data.get('error'):
+                print(f"\n❌ Job failed: {data['error']}")
+            return data
+        time.sleep(JOB_POLL_INTERVAL)
+
+def print_results(results, data):
+    """Print the per-file ingestion summary; returns True only if every file was ingested"""
+    failed = [result for result in results if not result.get('success')]
+    if not failed:
+        print("\n✅ Upload successful!")
+    elif len(failed) < len(results):
+        print(f"\n⚠️ Upload partially failed: {len(failed)} of {len(results)} files were not ingested")
+    else:
+        print("\n❌ Upload failed: no file was ingested")
+    print(f"📊 Total chunks ingested: {data.get('total_chunks', 0)}")
+    print(f"🧹 Near-duplicate chunks dropped: {data.get('duplicate_chunks', 0)}")
+    print(f"⚡ Throughput: {data.get('chunks_per_sec', 0)} chunks/sec")
+    
+    if results:
+        print("\n📄 Results:")
+        for result in results:
+            if result.get('success'):
+                print(f"  ✅ {result['filename']}: {result['chunks']} chunks ({result.get('chunks_per_sec', 0)} chunks/sec)")
+            else:
+                print(f"  ❌ {result['filename']}: {result.get('error', 'Unknown error')}")
+    
+    return not failed
+
 def check_service():
     """Check if RAG service is running"""
     try:
@@ -146,6 +197,8 @@ def main():
         get_stats()
     
     print("\n" + "=" * 60)
+    if not success:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
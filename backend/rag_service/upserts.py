@@ -0,0 +1,163 @@
+"""
+Concurrent, size-aware vector upserts with retry
+Chunk text rides along in metadata, so a fixed vector count per request
+can exceed the vector store's request-size limit. Vectors are packed into
+batches by serialized size (and count), several batches are in flight at
+once, transient failures (throttling, 5xx, connection errors) are retried
+with jittered exponential backoff, and batches rejected outright are split
+to isolate the offending vectors. Whatever still fails is reported by id
+instead of being dropped.
+"""
+
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+MAX_REQUEST_BYTES = 2 * 1024 * 1024  # Pinecone's upsert request limit
+MAX_BATCH_VECTORS = 1000  # Pinecone's vectors-per-upsert limit
+DEFAULT_BATCH_BYTES = MAX_REQUEST_BYTES * 3 // 4  # Headroom for request framing
+DEFAULT_CONCURRENCY = 4
+_TRANSIENT_ERRORS = ("timeout", "connection", "protocol", "temporar", "unavailable", "reset")
+
+
+class UpsertResult(NamedTuple):
+    upserted: int
+    failed_ids: List[str]
+    batches: int
+    retries: int
+
+
+def vector_bytes(vector: Dict) -> int:
+    """Serialized (JSON) size of one vector, as sent in an upsert request"""
+    return len(json.dumps(vector, separators=(",", ":"), default=float).encode("utf-8"))
+
+
+def plan_batches(vectors: List[Dict], max_bytes: int = DEFAULT_BATCH_BYTES,
+                 max_vectors: int = MAX_BATCH_VECTORS) -> List[List[Dict]]:
+    """Greedily pack vectors, in order, into batches under both limits"""
+    batches, batch, size = [], [], 0
+    for vector in vectors:
+        nbytes = vector_bytes(vector)
+        if batch and (size + nbytes > max_bytes or len(batch) >= max_vectors):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(vector)
+        size += nbytes
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def is_transient(error: Exception) -> bool:
+    """Throttling, server errors and network failures are worth retrying"""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    name = type(error).__name__.lower()
+    return any(marker in name for marker in _TRANSIENT_ERRORS)
+
+
+def is_rejection(error: Exception) -> bool:
+    """
+    Explicit payload rejections (HTTP 400/413/422), worth splitting the batch
+    for. Anything else (auth, quota, outages, unknown errors) is not: a whole
+    batch failing for another reason must not fan out into per-vector calls.
+    """
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return isinstance(status, int) and status in (400, 413, 422)
+
+
+class Upserter:
+    """
+    Sends upserts on a thread pool, `concurrency` requests at a time.
+    Call submit() as vectors become ready (e.g. per embedding batch), then
+    close() to wait for everything and get the UpsertResult. Usable as a
+    context manager; `upsert` is called as upsert(vectors=batch).
+    """
+
+    def __init__(self, upsert: Callable, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_bytes: int = DEFAULT_BATCH_BYTES, max_vectors: int = MAX_BATCH_VECTORS,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.upsert = upsert
+        self.concurrency = max(1, concurrency)
+        self.max_bytes = max_bytes
+        self.max_vectors = max_vectors
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upsert")
+        self._slots = threading.BoundedSemaphore(self.concurrency * 2)  # Bounds vectors held in memory
+        self._futures = []
+        self._lock = threading.Lock()
+        self._upserted = 0
+        self._failed_ids: List[str] = []
+        self._batches = 0
+        self._retries = 0
+        self._result: Optional[UpsertResult] = None
+
+    def submit(self, vectors: List[Dict]):
+        """Queue vectors for upserting; blocks while too many batches are pending"""
+        for batch in plan_batches(vectors, self.max_bytes, self.max_vectors):
+            self._slots.acquire()
+            future = self._executor.submit(self._send, batch)
+            future.add_done_callback(lambda _: self._slots.release())
+            self._futures.append(future)
+
+    def close(self) -> UpsertResult:
+        """Wait for every submitted batch and return the totals"""
+        if self._result is None:
+            for future in self._futures:
+                future.result()
+            self._executor.shutdown()
+            with self._lock:
+                self._result = UpsertResult(self._upserted, list(self._failed_ids), self._batches, self._retries)
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, batch: List[Dict]):
+        """Upsert one batch with retries; split it if it is rejected outright"""
+        attempt = 0
+        while True:
+            try:
+                self.upsert(vectors=batch)
+                with self._lock:
+                    self._upserted += len(batch)
+                    self._batches += 1
+                return
+            except Exception as e:
+                if is_transient(e) and attempt < self.max_retries:
+                    # Full jitter: uniform over an exponentially growing window
+                    self.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+                    attempt += 1
+                    with self._lock:
+                        self._retries += 1
+                    continue
+                if len(batch) > 1 and is_rejection(e):
+                    # e.g. an oversized or malformed vector: find it by bisection
+                    middle = len(batch) // 2
+                    self._send(batch[:middle])
+                    self._send(batch[middle:])
+                    return
+                print(f"⚠️ Upsert of {len(batch)} vectors failed: {str(e)}")
+                with self._lock:
+                    self._failed_ids.extend(vector["id"] for vector in batch)
+                return
+
+
+def upsert_vectors(upsert: Callable, vectors: List[Dict], **kwargs) -> UpsertResult:
+    """Upsert a list of vectors concurrently in one call (see Upserter for options)"""
+    with Upserter(upsert, **kwargs) as upserter:
+        upserter.submit(vectors)
+    return upserter.close()
@@ -0,0 +1,590 @@
+"""
+Vector store backends for the F-Buddy RAG pipeline
+Every backend exposes the subset of the Pinecone Index API used by the
+RAG code (upsert / query / delete / describe_index_stats), so a local
+store can be dropped in wherever a Pinecone index is expected.
+
+Backends (selected with VECTOR_STORE):
+- pinecone: remote Pinecone index (default)
+- numpy:    exact cosine search over a memory-mapped embedding matrix
+- ivf:      inverted-file approximate search for large local corpora
+
+Namespaces partition an index (e.g. one per student plus the shared
+advisory corpus): a query only searches its own namespace. Local stores
+keep one store per namespace, so query cost does not grow with the other
+partitions. Queries also accept Pinecone-style metadata filters.
+"""
+
+import os
+import re
+import json
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from file_lock import FileLock, file_version
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 dimension
+VECTOR_STORE_BACKENDS = ("pinecone", "numpy", "ivf")
+DEFAULT_NAMESPACE = ""
+
+_INITIAL_CAPACITY = 1024
+_COMPACT_MIN_ENTRIES = 4096  # Log lines tolerated beyond 2x the live rows before compacting
+_NAMESPACE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def check_namespace(namespace: Optional[str]) -> str:
+    """Validate a namespace name ('' or None is the default namespace)"""
+    if not namespace:
+        return DEFAULT_NAMESPACE
+    if not isinstance(namespace, str) or not _NAMESPACE.match(namespace) or namespace.startswith("."):
+        raise ValueError(f"Invalid namespace: {namespace!r} (use up to 64 letters, digits, '_', '-' or '.')")
+    return namespace
+
+
+def partition_path(path: str, namespace: str) -> str:
+    """Per-namespace variant of a file path (lexical_index.json -> lexical_index.<ns>.json)"""
+    if not namespace:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{namespace}{ext}"
+
+
+def index_state_dir(backend: str, index_name: Optional[str], store_path: str, base_dir: str) -> str:
+    """
+    Directory for the state derived from one index (ingest manifest, BM25
+    and dedup indexes): a local store's own directory, or
+    <base_dir>/index_state/<index name> for Pinecone. Entry points on the
+    same index share this state; entry points on different indexes do not.
+    """
+    if (backend or "").lower() == "pinecone":
+        path = os.path.join(base_dir, "index_state", re.sub(r"[^A-Za-z0-9_.-]", "_", index_name or "default"))
+    else:
+        path = store_path
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def check_filter(metadata_filter) -> Optional[Dict]:
+    """Validate a Pinecone-style metadata filter; returns None for no filter"""
+    if not metadata_filter:
+        return None
+    if not isinstance(metadata_filter, dict):
+        raise ValueError("filter must be an object")
+    for key, condition in metadata_filter.items():
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list):
+                raise ValueError(f"{key} takes a list of filters")
+            for clause in condition:
+                check_filter(clause)
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported filter operator: {key}")
+        elif isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op not in _COMPARISONS and op != "$exists":
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if op in ("$in", "$nin") and not isinstance(operand, list):
+                    raise ValueError(f"{op} takes a list")
+    return metadata_filter
+
+
+def matches_filter(metadata: Optional[Dict], metadata_filter: Optional[Dict]) -> bool:
+    """
+    Evaluate a Pinecone metadata filter against one vector's metadata:
+    {"source": "a.pdf"}, {"year": {"$gte": 2024}}, {"$or": [...]}, ...
+    List-valued metadata matches when any element does.
+    """
+    if not metadata_filter:
+        return True
+    metadata = metadata or {}
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$exists":
+                    if (key in metadata) != bool(operand):
+                        return False
+                    continue
+                compare = _COMPARISONS[op]
+                values = value if isinstance(value, list) else [value]
+                try:
+                    if op in ("$ne", "$nin"):
+                        matched = all(compare(v, operand) for v in values)
+                    else:
+                        matched = any(compare(v, operand) for v in values)
+                except TypeError:
+                    matched = False  # e.g. comparing a string with a number
+                if not matched:
+                    return False
+    return True
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _unpack_vector(vector) -> tuple:
+    """Accept both Pinecone dict and tuple vector formats"""
+    if isinstance(vector, dict):
+        return vector["id"], vector["values"], vector.get("metadata") or {}
+    vector_id, values = vector[0], vector[1]
+    metadata = vector[2] if len(vector) > 2 else {}
+    return vector_id, values, metadata or {}
+
+
+class NumpyVectorStore:
+    """
+    Exact cosine search over a memory-mapped float32 matrix.
+    Vectors live in <path>/vectors.f32; ids and metadata in <path>/meta.jsonl,
+    an append-only log with one line per written or deleted row (compacted
+    once mostly superseded), so a write costs its own batch, not the corpus.
+    Deleted rows are tombstoned and reused by later upserts.
+    Processes can share a store: writers hold <path>/lock and first replay
+    what others appended; queries replay new log lines before searching.
+    """
+
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIM):
+        self.path = path
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._log_path = os.path.join(path, "meta.jsonl")
+        os.makedirs(path, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(path, "lock"))
+
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict]] = []
+        self._row_of: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._matrix = None
+        self._live = np.zeros(0, dtype=bool)
+        with self._lock, self._file_lock:
+            self._open_matrix(_INITIAL_CAPACITY)
+            if not os.path.exists(self._log_path):
+                self._migrate_meta_json()
+            self._refresh()
+
+    # -----------------------------
+    # STORAGE
+    # -----------------------------
+    def _open_matrix(self, capacity: int):
+        """(Re)map the vector file, growing it to hold `capacity` rows"""
+        row_bytes = self.dimension * 4
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        current = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if current < capacity * row_bytes:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        capacity = os.path.getsize(self._vectors_path) // row_bytes
+        self._matrix = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension)
+        )
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._live.shape[0]] = self._live
+        self._live = live
+
+    def _migrate_meta_json(self):
+        """Start the log, converting a store saved in the old whole-file meta.json format"""
+        legacy_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            self._check_dimension(saved.get("dimension", self.dimension))
+            self._ids, self._metadata = saved["ids"], saved["metadata"]
+            self._index_rows()
+        self._compact()
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def _check_dimension(self, dimension: int):
+        if dimension != self.dimension:
+            raise ValueError(f"Vector store at {self.path} has dimension {dimension}, expected {self.dimension}")
+
+    def _index_rows(self):
+        """Rebuild the id -> row map, free rows and live mask from the row lists"""
+        n = len(self._ids)
+        if n > self._matrix.shape[0]:
+            self._open_matrix(n)
+        self._row_of = {vid: row for row, vid in enumerate(self._ids) if vid is not None}
+        self._free_rows = [row for row, vid in enumerate(self._ids) if vid is None]
+        self._live[:] = False
+        self._live[:n] = [vid is not None for vid in self._ids]
+
+    def _refresh(self):
+        """Replay log lines appended (by any process) since the last refresh"""
+        version = file_version(self._log_path)
+        if version is None or (version[0] == self._log_inode and version[2] == self._log_offset):
+            return
+        with open(self._log_path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._log_inode:
+                # First load, or another process compacted the log: replay it all
+                self._ids, self._metadata = [], []
+                self._log_inode, self._log_offset, self._log_entries = inode, 0, 0
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # A line still being appended is read next time
+
+        rows = []
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if "row" not in entry:
+                self._check_dimension(entry["dimension"])
+                continue
+            row = entry["row"]
+            while len(self._ids) <= row:
+                self._ids.append(None)
+                self._metadata.append(None)
+            self._ids[row] = entry["id"]
+            self._metadata[row] = entry.get("metadata")
+            rows.append(row)
+        self._log_offset += end
+        self._log_entries += len(rows)
+        if rows:
+            self._index_rows()
+            self._on_rows_written(np.unique(rows))
+            self._on_rows_deleted()
+
+    def _append_log(self, entries: List[Dict]):
+        """Record written/deleted rows; vectors must already be in the matrix"""
+        self._matrix.flush()  # Vectors reach the file before the log points at them
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with open(self._log_path, "ab") as f:
+            f.write(data)
+            self._log_offset = f.tell()
+        self._log_entries += len(entries)
+        if self._log_entries > 2 * len(self._row_of) + _COMPACT_MIN_ENTRIES:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the log as one line per live row"""
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"dimension": self.dimension}) + "\n")
+            for row, vid in enumerate(self._ids):
+                if vid is not None:
+                    f.write(json.dumps({"row": row, "id": vid, "metadata": self._metadata[row]}) + "\n")
+        os.replace(tmp_path, self._log_path)
+        inode, _, size = file_version(self._log_path)
+        self._log_inode, self._log_offset, self._log_entries = inode, size, len(self._row_of)
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        row = len(self._ids)
+        if row >= self._matrix.shape[0]:
+            self._open_matrix(self._matrix.shape[0] * 2)
+        self._ids.append(None)
+        self._metadata.append(None)
+        return row
+
+    # -----------------------------
+    # PINECONE-COMPATIBLE API
+    # -----------------------------
+    def upsert(self, vectors: List, **kwargs) -> Dict:
+        """Insert or overwrite vectors (Pinecone dict or tuple format)"""
+        with self._lock, self._file_lock:
+            self._refresh()
+            rows = []
+            entries = []
+            for vector in vectors:
+                vector_id, values, metadata = _unpack_vector(vector)
+                row = self._row_of.get(vector_id)
+                if row is None:
+                    row = self._allocate_row()
+                    self._row_of[vector_id] = row
+                self._ids[row] = vector_id
+                self._metadata[row] = metadata
+                self._live[row] = True
+                rows.append((row, values))
+                entries.append({"row": row, "id": vector_id, "metadata": metadata})
+
+            if rows:
+                row_idx = np.array([row for row, _ in rows])
+                values = np.asarray([vals for _, vals in rows], dtype=np.float32)
+                self._matrix[row_idx] = _normalize(values)
+                self._on_rows_written(row_idx)
+                self._append_log(entries)
+            return {"upserted_count": len(rows)}
+
+    def query(self, vector=None, top_k: int = 10, include_metadata: bool = False,
+              filter: Optional[Dict] = None, **kwargs) -> Dict:
+        """Return the top_k most similar vectors (matching `filter`) as Pinecone-style matches"""
+        with self._lock:
+            self._refresh()
+            if not self._row_of or top_k <= 0:
+                return {"matches": []}
+            q = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+            rows = self._candidate_rows(q)
+            if rows is None:
+                # Exact search: score the whole live prefix in one matmul
+                n = len(self._ids)
+                rows = np.arange(n)
+                scores = self._matrix[:n] @ q
+                scores[~self._live[:n]] = -np.inf
+                top_k = min(top_k, len(self._row_of))
+            elif rows.size == 0:
+                return {"matches": []}
+            else:
+                scores = self._matrix[rows] @ q
+
+            if filter:
+                allowed = np.fromiter(
+                    (self._ids[row] is not None and matches_filter(self._metadata[row], filter) for row in rows),
+                    dtype=bool, count=rows.size
+                )
+                if not allowed.any():
+                    return {"matches": []}
+                scores = np.where(allowed, scores, -np.inf)
+                top_k = min(top_k, int(allowed.sum()))
+
+            k = min(top_k, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            matches = []
+            for i in top:
+                row = int(rows[i])
+                match = {"id": self._ids[row], "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = self._metadata[row]
+                matches.append(match)
+            return {"matches": matches}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, **kwargs):
+        """Delete vectors by id, or everything with delete_all=True"""
+        with self._lock, self._file_lock:
+            self._refresh()
+            if delete_all:
+                ids = list(self._row_of)
+            entries = []
+            for vector_id in ids or []:
+                row = self._row_of.pop(vector_id, None)
+                if row is None:
+                    continue
+                self._ids[row] = None
+                self._metadata[row] = None
+                self._matrix[row] = 0.0
+                self._live[row] = False
+                self._free_rows.append(row)
+                entries.append({"row": row, "id": None})
+            if entries:
+                self._on_rows_deleted()
+                self._append_log(entries)
+            return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict:
+        with self._lock:
+            self._refresh()
+            return {"total_vector_count": len(self._row_of), "dimension": self.dimension}
+
+    # -----------------------------
+    # SEARCH HOOKS
+    # -----------------------------
+    def _candidate_rows(self, q: np.ndarray) -> np.ndarray:
+        """Rows to score exactly for query q, or None to score every live row"""
+        return None
+
+    def _on_rows_written(self, rows: np.ndarray):
+        pass
+
+    def _on_rows_deleted(self):
+        pass
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """
+    Approximate search with an inverted-file index on top of NumpyVectorStore.
+    Vectors are clustered with spherical k-means into `nlist` lists and a
+    query only scores the rows in its `nprobe` closest lists. Below
+    `min_train_size` vectors the store falls back to exact search.
+    """
+
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIM, nlist: Optional[int] = None,
+                 nprobe: int = 8, min_train_size: int = 4096):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self._centroids = None
+        self._assignments = None
+        self._trained_size = 0
+        super().__init__(path, dimension)
+
+    def _train(self):
+        """Cluster the live vectors and assign every row to a list"""
+        live_rows = np.flatnonzero(self._live[:len(self._ids)])
+        nlist = self.nlist or max(1, int(np.sqrt(live_rows.size)))
+        rng = np.random.default_rng(0)
+        sample = live_rows
+        if sample.size > nlist * 64:
+            sample = rng.choice(live_rows, nlist * 64, replace=False)
+        data = np.asarray(self._matrix[sample])
+
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)]
+        for _ in range(10):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+        self._assign(live_rows)
+        self._trained_size = live_rows.size
+
+    def _assign(self, rows: np.ndarray):
+        if self._assignments.shape[0] < self._matrix.shape[0]:
+            grown = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            grown[:self._assignments.shape[0]] = self._assignments
+            self._assignments = grown
+        for start in range(0, rows.size, 8192):
+            block = rows[start:start + 8192]
+            self._assignments[block] = np.argmax(self._matrix[block] @ self._centroids.T, axis=1)
+
+    def _candidate_rows(self, q: np.ndarray) -> np.ndarray:
+        live = len(self._row_of)
+        if live < self.min_train_size:
+            return super()._candidate_rows(q)
+        if self._centroids is None or live >= 2 * self._trained_size:
+            self._train()
+
+        nprobe = min(self.nprobe, self._centroids.shape[0])
+        probes = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+        assignments = self._assignments[:len(self._ids)]
+        return np.flatnonzero(np.isin(assignments, probes))
+
+    def _on_rows_written(self, rows: np.ndarray):
+        if self._centroids is not None:
+            self._assign(rows)
+
+    def _on_rows_deleted(self):
+        if self._assignments is not None:
+            n = len(self._ids)
+            self._assignments[:n][~self._live[:n]] = -1
+
+
+class NamespacedVectorStore:
+    """
+    Pinecone-style namespaces over local stores: one store per namespace.
+    The default namespace lives at `path` itself (so existing stores keep
+    working), the others under <path>/namespaces/<namespace>.
+    """
+
+    def __init__(self, path: str, open_store: Callable[[str], NumpyVectorStore]):
+        self.path = path
+        self.open_store = open_store
+        self._lock = threading.Lock()
+        self._stores: Dict[str, NumpyVectorStore] = {DEFAULT_NAMESPACE: open_store(path)}
+        self._discover()
+
+    def _discover(self):
+        """Open namespaces created on disk (possibly by another process)"""
+        namespaces_dir = os.path.join(self.path, "namespaces")
+        if os.path.isdir(namespaces_dir):
+            for namespace in sorted(os.listdir(namespaces_dir)):
+                if namespace not in self._stores:
+                    self._store(namespace)
+
+    def _store(self, namespace: Optional[str]) -> NumpyVectorStore:
+        namespace = check_namespace(namespace)
+        with self._lock:
+            store = self._stores.get(namespace)
+            if store is None:
+                store = self._stores[namespace] = self.open_store(os.path.join(self.path, "namespaces", namespace))
+            return store
+
+    def _existing(self, namespace: Optional[str]) -> Optional[NumpyVectorStore]:
+        namespace = check_namespace(namespace)
+        with self._lock:
+            store = self._stores.get(namespace)
+        if store is None and os.path.isdir(os.path.join(self.path, "namespaces", namespace)):
+            store = self._store(namespace)
+        return store
+
+    @property
+    def dimension(self) -> int:
+        return self._stores[DEFAULT_NAMESPACE].dimension
+
+    def upsert(self, vectors: List, namespace: Optional[str] = None, **kwargs) -> Dict:
+        return self._store(namespace).upsert(vectors, **kwargs)
+
+    def query(self, vector=None, top_k: int = 10, include_metadata: bool = False,
+              filter: Optional[Dict] = None, namespace: Optional[str] = None, **kwargs) -> Dict:
+        store = self._existing(namespace)  # Querying must not create empty namespaces
+        if store is None:
+            return {"matches": []}
+        return store.query(vector=vector, top_k=top_k, include_metadata=include_metadata, filter=filter, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False,
+               namespace: Optional[str] = None, **kwargs):
+        store = self._existing(namespace)
+        if store is None:
+            return {}
+        return store.delete(ids=ids, delete_all=delete_all, **kwargs)
+
+    def describe_index_stats(self, **kwargs) -> Dict:
+        self._discover()
+        with self._lock:
+            stores = dict(self._stores)
+        counts = {namespace: store.describe_index_stats()["total_vector_count"] for namespace, store in stores.items()}
+        return {
+            "total_vector_count": sum(counts.values()),
+            "dimension": self.dimension,
+            "namespaces": {namespace: {"vector_count": count} for namespace, count in counts.items() if count},
+        }
+
+
+def open_vector_store(backend: str, path: str, dimension: int = EMBEDDING_DIM, **kwargs):
+    """Open a local vector store by backend name ('numpy' or 'ivf'), with namespace support"""
+    backend = (backend or "").lower()
+    if backend == "numpy":
+        return NamespacedVectorStore(path, lambda store_path: NumpyVectorStore(store_path, dimension))
+    if backend == "ivf":
+        return NamespacedVectorStore(path, lambda store_path: IVFVectorStore(store_path, dimension, **kwargs))
+    raise ValueError(f"Unknown local vector store backend: {backend!r} (expected one of {VECTOR_STORE_BACKENDS})")
+
+
+def namespace_counts(stats) -> Dict[str, int]:
+    """{namespace: vector count} from describe_index_stats() of any backend"""
+    counts = {}
+    for namespace, summary in (stats.get("namespaces") or {}).items():
+        count = summary.get("vector_count") if isinstance(summary, dict) else getattr(summary, "vector_count", 0)
+        counts[namespace] = int(count or 0)
+    return counts
+
+
+def delete_vectors(index, ids: List[str], batch_size: int = 1000, namespace: str = DEFAULT_NAMESPACE) -> int:
+    """Delete ids from any backend in batches (Pinecone caps ids per delete call)"""
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i:i + batch_size], namespace=namespace)
+    return len(ids)
@@ -0,0 +1,22 @@
+"""
+WSGI entry point for running the RAG service with multiple workers
+Loads the embedding model (and reranker) once in the master process, so
+forked workers share the weights copy-on-write; see gunicorn.conf.py.
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import gc
+
+import rag_server
+from rag_server import app
+
+# Load clients without running inference; each worker warms up after fork
+try:
+    rag_server.init_clients(warm=False)
+except Exception as e:
+    print(f"❌ Preload failed, workers will initialize on first request: {e}")
+
+# Move everything loaded so far out of the GC's reach, so collections in
+# the workers do not touch (and un-share) those pages
+gc.freeze()